@@ -7,4 +7,32 @@ def create_app():
     app.register_blueprint(main)
     app.register_blueprint(auth)
 
+    from .metrics import register_request_metrics
+    register_request_metrics(app)
+
+    # Make sure tables added since the database was built (jobs, sessions, ...) exist
+    from config import (
+        DB_PATH, MATCH_JOB_WORKERS, NOTIFICATION_DISPATCH_INTERVAL, NOTIFICATION_SINK, USE_READ_REPLICA
+    )
+    from scripts.setup_db import initialize_database
+    initialize_database(DB_PATH)
+
+    # Follow student/subject changes made by other workers and insert_data.py
+    from utils.change_feed import poll_changes, start_change_feed
+    start_change_feed()
+    app.before_request(poll_changes)
+
+    if USE_READ_REPLICA:
+        from utils.replica import load_replica
+        load_replica()
+
+    if MATCH_JOB_WORKERS:
+        from utils.job_utils import start_match_workers
+        start_match_workers(MATCH_JOB_WORKERS)
+
+    # Without a configured sink there is nowhere to deliver to, so notifications stay queued
+    if NOTIFICATION_SINK and NOTIFICATION_DISPATCH_INTERVAL > 0:
+        from utils.notification_utils import load_sink, start_notification_dispatcher
+        start_notification_dispatcher(load_sink(NOTIFICATION_SINK), NOTIFICATION_DISPATCH_INTERVAL)
+
     return app
\ No newline at end of file
@@ -0,0 +1,51 @@
+import os
+import time
+
+from flask import g, request
+
+from config import ENABLE_REQUEST_PROFILING, PROFILE_DIR
+from utils.metrics_utils import QUERY_COUNT_BUCKETS, SamplingProfiler, observe, start_sql_tracking
+
+
+def register_request_metrics(app):
+    """
+    Record latency and SQL usage for every request, and profile requests that ask for it.
+
+    With ENABLE_REQUEST_PROFILING on, a request sent with the header "X-Profile: 1" is sampled
+    by SamplingProfiler; the collapsed stacks are written to PROFILE_DIR and the file name is
+    returned in the X-Profile-File response header.
+    """
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_start = time.perf_counter()
+        g.sql_stats = start_sql_tracking()
+        g.profiler = None
+        if ENABLE_REQUEST_PROFILING and request.headers.get("X-Profile") == "1":
+            g.profiler = SamplingProfiler().start()
+
+    @app.after_request
+    def record_request_metrics(response):
+        if "request_start" not in g:
+            return response
+        endpoint = request.endpoint or "unknown"
+        observe("study_buddy_request_duration_seconds", time.perf_counter() - g.request_start, {"endpoint": endpoint})
+        observe("study_buddy_request_sql_queries", g.sql_stats["queries"], {"endpoint": endpoint}, QUERY_COUNT_BUCKETS)
+        observe("study_buddy_request_sql_seconds", g.sql_stats["seconds"], {"endpoint": endpoint})
+
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.stop()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            filename = f"{endpoint.replace('.', '_')}_{int(time.time() * 1000)}.folded"
+            with open(os.path.join(PROFILE_DIR, filename), "w") as f:
+                f.write(profiler.collapsed())
+            response.headers["X-Profile-File"] = filename
+        return response
+
+    @app.teardown_request
+    def stop_request_profiler(exc):
+        # after_request is skipped when a view raises, so the sampling thread is stopped here too
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.stop()
@@ -1,39 +1,90 @@
-from flask import Blueprint, render_template, request, redirect
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, render_template, request, redirect, jsonify, Response
+import json
+from werkzeug.security import generate_password_hash
 import sys
 import os
-import sqlite3
+import bisect
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
 
-from scripts.utils.db_utils import get_or_create_subject, get_next_student_id
-from scripts.utils.time_utils import STUDY_TIME_RANGES, shift_to_utc, shift_to_local, get_utc_day
+from scripts.utils.db_utils import get_connection
+from scripts.utils.time_utils import STUDY_TIME_RANGES, shift_to_utc, shift_to_local
+# Modules holding process-wide state are imported under the same names the scripts/utils
+# modules use for each other, so there is only one copy of each cache, queue and registry
+from utils.job_utils import enqueue_match_job, get_match_job
+from utils.write_queue import submit_registration
+from utils.replica import get_read_connection
+from utils.match_cache import get_cached_matches, get_cached_profiles, get_learner_ids
+from utils.metrics_utils import render_prometheus
+from utils.subject_catalog import get_subject_names, resolve_subject_name, search_subjects
+from utils.message_utils import (
+    MAX_MESSAGE_LENGTH, conversation_id, get_latest_message_id, get_messages, send_message,
+    wait_for_messages
+)
+from utils.session_utils import (
+    SESSION_COOKIE, LoginThrottled, create_session, delete_session, get_session, verify_password
+)
 # from scripts.matching_logic import default_match, custom_match
 
-from config import DB_PATH
+from config import SESSION_LIFETIME_SECONDS
 
 main = Blueprint("main", __name__)
 auth = Blueprint('auth', __name__)
 
+def current_session():
+    """
+    Session for the signed token in the cookie or an "Authorization: Bearer" header, if any.
+    """
+    token = request.cookies.get(SESSION_COOKIE)
+    auth_header = request.headers.get("Authorization", "")
+    if auth_header.startswith("Bearer "):
+        token = auth_header[len("Bearer "):]
+    return get_session(token)
+
+
 @auth.route("/", methods=["GET", "POST"])
 def login():
+    # Already signed in: skip the password check entirely
+    session = current_session()
+    if session and session["student_id"]:
+        return redirect(f"/account/{session['student_id']}")
+
     if request.method == "POST":
         email = request.form.get("email")
         password = request.form.get("password")
 
-        with sqlite3.connect(DB_PATH) as conn:
+        # From disk: accounts created moments ago are not in the replica yet
+        with get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT user_id, password, student_id FROM users WHERE email = ?", (email,))
             user = cursor.fetchone()
 
-            if user and check_password_hash(user[1], password):
-                return redirect(f"/account/{user[2]}")
-            else:
-                return render_template("login.html", error="Invalid credentials")
+        try:
+            valid = bool(user) and verify_password(email, user[1], password)
+        except LoginThrottled as e:
+            return render_template("login.html", error=str(e)), 429
+
+        if valid:
+            token = create_session(user[0], user[2])
+            response = redirect(f"/account/{user[2]}")
+            response.set_cookie(
+                SESSION_COOKIE, token, max_age=SESSION_LIFETIME_SECONDS, httponly=True, samesite="Lax",
+                secure=request.is_secure
+            )
+            return response
+        else:
+            return render_template("login.html", error="Invalid credentials")
 
     return render_template("login.html")
 
+@auth.route("/logout")
+def logout():
+    delete_session(request.cookies.get(SESSION_COOKIE))
+    response = redirect("/")
+    response.delete_cookie(SESSION_COOKIE)
+    return response
+
 @auth.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
@@ -46,7 +97,7 @@ def register():
 
         hashed_pw = generate_password_hash(password)
         
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_connection() as conn:
             cursor = conn.cursor()
 
             cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
@@ -105,70 +156,52 @@ def form():
         
         subjects = request.form.getlist("preferred_subjects[]")
         other_subject = request.form.get("other_subject")
-        if other_subject:
-            subjects.append(other_subject.strip().title())
-
-        student_id = get_next_student_id()
-
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,))
-            if not cursor.fetchone():
-                return "User not found", 404
-            cursor.execute("""
-                INSERT INTO students (
-                    student_id, student_name, personality_type, study_style, utc_offset,
-                    experience_level, GPA, utc_start_time, utc_end_time
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                student_id,
-                student_name,
-                personality_type,
-                study_style,
-                utc_offset,
-                experience_level,
-                gpa,
-                utc_start_time,
-                utc_end_time
-            ))
-            
-            for day in days_of_wk_avail:
-                cursor.execute(
-                    'INSERT OR IGNORE INTO study_days (student_id, day) VALUES (?, ?)',
-                    (student_id, day)
-                )
-                utc_day = get_utc_day(day, local_start, utc_offset)
-                cursor.execute(
-                    'INSERT OR IGNORE INTO utc_study_days (student_id, utc_day) VALUES (?, ?)',
-                    (student_id, utc_day)
-                )
-
-            for subject_name in subjects:
-                subject_id = get_or_create_subject(cursor, subject_name)
-                cursor.execute(
-                    "INSERT OR IGNORE INTO student_subjects (student_id, subject_id) VALUES (?, ?)",
-                    (student_id, subject_id)
-                )
-            
-            cursor.execute(
-                "UPDATE users SET student_id = ? WHERE user_id = ?",
-                (student_id, user_id)
-)
+        if other_subject and other_subject.strip():
+            # Reuse an existing subject if the free text is the same or a near duplicate
+            subjects.append(resolve_subject_name(other_subject))
+
+        registration = {
+            "user_id": user_id,
+            "student_name": student_name,
+            "personality_type": personality_type,
+            "study_style": study_style,
+            "utc_offset": utc_offset,
+            "experience_level": experience_level,
+            "GPA": gpa,
+            "utc_start_time": utc_start_time,
+            "utc_end_time": utc_end_time,
+            "local_start": local_start,
+            "days": days_of_wk_avail,
+            "subjects": subjects,
+        }
+
+        # Written by the single registration writer, batched with other submissions; the
+        # writer applies the change feed, so cached matches and the replica already include it
+        try:
+            student_id = submit_registration(registration)
+        except LookupError:
+            return "User not found", 404
 
         return redirect(f"/account/{student_id}")
 
-    # GET: pull subjects list from db
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT subject_name FROM subjects ORDER BY subject_name")
-        subjects = [row[0] for row in cursor.fetchall()]
+    # GET: subjects list from the cached catalog
+    subjects = get_subject_names()
 
     return render_template("form.html", subjects=subjects)
 
 
+@main.route("/subjects/search")
+def subject_search():
+    query = request.args.get("q", "")
+    limit = min(max(request.args.get("limit", 10, type=int), 1), 50)
+    response = jsonify(query=query, subjects=search_subjects(query, limit))
+    response.headers["Cache-Control"] = "public, max-age=60"
+    return response
+
+
 @main.route("/account/<student_id>")
 def account(student_id):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_read_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT student_name, personality_type, study_style, utc_offset,
@@ -234,3 +267,179 @@ def match(student_id):
 #         matches = custom_match(student_id, preferences, student_profiles)
 
 #     return render_template('match_results.html', student_id=student_id, matches=matches)
+
+
+PREFERENCE_KEYS = ['subjects', 'days', 'time', 'style', 'GPA', 'personality']
+MAX_MATCH_K = 20
+MAX_PAGE_SIZE = 500
+
+
+def parse_match_args():
+    """
+    Read mode, preference flags and k from the query string (e.g. ?mode=custom&subjects=1&k=5).
+    """
+    mode = request.args.get('mode', 'default')
+    preferences = {
+        key: request.args.get(key, '').lower() in ('1', 'true', 'yes', 'on')
+        for key in PREFERENCE_KEYS
+    }
+    k = min(max(request.args.get('k', 3, type=int), 1), MAX_MATCH_K)
+    return mode, preferences, k
+
+
+def compact_matches(matches):
+    """
+    Drop the repeated learner ID from each match row.
+    """
+    return [{key: value for key, value in m.items() if key != 'student_id'} for m in matches]
+
+
+@main.route('/api/match/<student_id>')
+def match_json(student_id):
+    mode, preferences, k = parse_match_args()
+    if mode not in ('default', 'custom'):
+        return jsonify(error="mode must be 'default' or 'custom'"), 400
+    profile = get_cached_profiles().get(student_id)
+    if profile is None:
+        return jsonify(error="Student not found"), 404
+    if profile['role'] != 'learner':
+        return jsonify(error="Matches are only available for learners"), 400
+
+    matches = get_cached_matches(student_id, mode, preferences, k)
+    response = jsonify(student_id=student_id, mode=mode, matches=compact_matches(matches))
+    response.headers['Cache-Control'] = 'private, max-age=60'
+    return response
+
+
+@main.route('/api/matches')
+def matches_json():
+    mode, preferences, k = parse_match_args()
+    if mode not in ('default', 'custom'):
+        return jsonify(error="mode must be 'default' or 'custom'"), 400
+    limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor')
+
+    # Cursor is the last learner ID of the previous page (learner IDs are sorted)
+    learner_ids = get_learner_ids()
+    start = bisect.bisect_right(learner_ids, cursor) if cursor else 0
+    page = learner_ids[start:start + limit]
+
+    results = {sid: compact_matches(get_cached_matches(sid, mode, preferences, k)) for sid in page}
+    next_cursor = page[-1] if start + limit < len(learner_ids) else None
+
+    response = jsonify(mode=mode, matches=results, next_cursor=next_cursor)
+    response.headers['Cache-Control'] = 'private, max-age=60'
+    return response
+
+
+@main.route('/jobs/match', methods=['POST'])
+def create_match_job():
+    mode, preferences, k = parse_match_args()
+    if mode not in ('default', 'custom', 'similarity'):
+        return jsonify(error="mode must be 'default', 'custom' or 'similarity'"), 400
+
+    job_id, created = enqueue_match_job(mode, preferences, k)
+    response = jsonify(job_id=job_id, created=created, status_url=f"/jobs/{job_id}")
+    response.status_code = 202
+    return response
+
+
+@main.route('/jobs/<int:job_id>')
+def match_job_status(job_id):
+    job = get_match_job(job_id)
+    if job is None:
+        return jsonify(error="Job not found"), 404
+
+    return jsonify(
+        job_id=job['job_id'],
+        mode=job['mode'],
+        status=job['status'],
+        progress=job['progress'],
+        total=job['total'],
+        result_path=job['result_path'],
+        error=job['error'],
+        created_at=job['created_at'],
+        finished_at=job['finished_at'],
+    )
+
+
+@main.route('/metrics')
+def metrics():
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+def are_matched(student_a, student_b):
+    """
+    True if either student appears in the other's default top matches.
+    """
+    return any(
+        other in {m['match_id'] for m in get_cached_matches(student, 'default', None, MAX_MATCH_K)}
+        for student, other in ((student_a, student_b), (student_b, student_a))
+    )
+
+
+def chat_participants(other_id):
+    """
+    (student_id, error_response) for the signed-in student chatting with `other_id`.
+    """
+    session = current_session()
+    if not session or not session['student_id']:
+        return None, (jsonify(error="Sign in to use messaging"), 401)
+    student_id = session['student_id']
+    if student_id == other_id or not are_matched(student_id, other_id):
+        return None, (jsonify(error="You can only message your matches"), 403)
+    return student_id, None
+
+
+@main.route('/messages/<other_id>', methods=['GET', 'POST'])
+def messages(other_id):
+    student_id, error = chat_participants(other_id)
+    if error:
+        return error
+
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or request.form
+        content = (data.get('content') or '').strip()
+        if not content or len(content) > MAX_MESSAGE_LENGTH:
+            return jsonify(error=f"content must be 1-{MAX_MESSAGE_LENGTH} characters"), 400
+        return jsonify(send_message(student_id, other_id, content)), 201
+
+    # Cursor is the oldest message_id of the previous page
+    limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_PAGE_SIZE)
+    page, next_cursor = get_messages(
+        conversation_id(student_id, other_id), request.args.get('before', type=int), limit
+    )
+    return jsonify(messages=page, next_cursor=next_cursor)
+
+
+@main.route('/messages/<other_id>/stream')
+def message_stream(other_id):
+    """
+    Server-sent events for new messages in a conversation.
+    """
+    student_id, error = chat_participants(other_id)
+    if error:
+        return error
+    conv = conversation_id(student_id, other_id)
+    # Browsers resend the last event ID when they reconnect; a fresh stream starts after the
+    # newest message, since older ones are fetched with GET /messages/<other_id>
+    after_id = request.headers.get('Last-Event-ID', type=int)
+    if after_id is None:
+        after_id = request.args.get('after', type=int)
+    if after_id is None:
+        after_id = get_latest_message_id(conv)
+
+    def events():
+        nonlocal after_id
+        while True:
+            new_messages = wait_for_messages(conv, after_id)
+            if not new_messages:
+                yield ": keepalive\n\n"
+                continue
+            for message in new_messages:
+                after_id = message['message_id']
+                yield f"id: {after_id}\ndata: {json.dumps(message)}\n\n"
+
+    response = Response(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -1,4 +1,36 @@
 import os
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "data", "processed", "study_buddy.db") 
\ No newline at end of file
+# STUDY_BUDDY_DB points the app and scripts at another database (e.g. a benchmark copy)
+DB_PATH = os.environ.get("STUDY_BUDDY_DB", os.path.join(BASE_DIR, "data", "processed", "study_buddy.db"))
+
+# Background match job workers started with the Flask app (0 disables them)
+MATCH_JOB_WORKERS = int(os.environ.get("MATCH_JOB_WORKERS", 2))
+MATCH_JOB_RESULTS_DIR = os.path.join(BASE_DIR, "data", "processed", "match_jobs")
+
+# Per-request sampling profiler, switched on by sending an "X-Profile: 1" header
+ENABLE_REQUEST_PROFILING = os.environ.get("ENABLE_REQUEST_PROFILING", "0") == "1"
+PROFILE_DIR = os.path.join(BASE_DIR, "data", "processed", "profiles")
+
+# Serve read-heavy routes from an in-memory copy of the database. Student and subject rows follow
+# the change feed; other tables are re-copied at most this often (a full copy of the file)
+USE_READ_REPLICA = os.environ.get("USE_READ_REPLICA", "0") == "1"
+REPLICA_MAX_STALENESS_SECONDS = float(os.environ.get("REPLICA_MAX_STALENESS_SECONDS", 300))
+
+# Signs session tokens; set SECRET_KEY in production so tokens survive restarts and work across workers
+SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-change-me")
+SESSION_LIFETIME_SECONDS = int(os.environ.get("SESSION_LIFETIME_SECONDS", 7 * 24 * 3600))
+# How long a worker trusts its cached copy of a session before re-checking it (logout in another worker)
+SESSION_CACHE_SECONDS = float(os.environ.get("SESSION_CACHE_SECONDS", 5))
+
+# Password hashing runs on a bounded pool so login bursts cannot take every worker
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get("PASSWORD_HASH_QUEUE_LIMIT", 32))
+LOGIN_ATTEMPTS_PER_MINUTE = int(os.environ.get("LOGIN_ATTEMPTS_PER_MINUTE", 10))
+
+# Seconds between notification dispatcher runs (0 disables the dispatcher)
+NOTIFICATION_DISPATCH_INTERVAL = float(os.environ.get("NOTIFICATION_DISPATCH_INTERVAL", 5))
+# Delivery sink as "module:callable" (a class is instantiated with no arguments), e.g.
+# "utils.notification_utils:MemorySink" in development. The dispatcher only runs when this is set;
+# until then notifications wait in the outbox.
+NOTIFICATION_SINK = os.environ.get("NOTIFICATION_SINK", "")
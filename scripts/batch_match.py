@@ -0,0 +1,324 @@
+"""
+Python script to run batch matching for many learners with checkpointed, resumable output.
+
+Learners are processed in chunks of --chunk-size. Each chunk is written to its own file in
+--output-dir (temporary file + rename, so a chunk file is either complete or absent), or with
+--output-db to a batch_matches table in a SQLite database (one transaction per chunk). A
+checkpoint file (checkpoint.json in --output-dir) records the learner list and which chunks
+are done. If a run is interrupted, running the same command again skips the completed chunks
+and continues with the next one.
+
+Per-chunk progress and a final summary with per-stage timing and throughput (learners/sec)
+are printed to stderr.
+
+Example:
+    python scripts/batch_match.py --mode custom --subjects --days --k 5 --output-dir data/processed/nightly
+    python scripts/batch_match.py --learners stu1000,stu1004 --output-dir /tmp/sample --format csv
+    python scripts/batch_match.py --output-dir /tmp/nightly --output-db /tmp/nightly/matches.db
+
+Note:
+- This script assumes the database has been populated (setup_db.py, then insert_data.py).
+- A resumed run keeps the learner list stored in the checkpoint, so learners added or removed
+  since do not shift the chunks: new learners are appended as extra chunks and removed ones
+  are skipped.
+- Changing the mode, preferences, k, chunk size, format or output target makes an existing
+  checkpoint unusable; pass --restart to discard it and start over.
+"""
+
+import argparse
+import json
+import time
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import DB_PATH
+from utils.db_utils import get_connection
+from utils.export_utils import PREFERENCE_KEYS, open_output, write_csv, write_ndjson
+from utils.match_utils import MATCH_COLUMNS, build_availability_index, iter_matches, load_student_profiles
+from utils.metrics_utils import get_stage_totals, stage_timer
+from utils.similarity_utils import build_tutor_vectors
+
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+def select_learners(student_profiles, learner_ids=None):
+    """
+    Sorted learner IDs to match, optionally limited to a subset.
+
+    Args:
+        student_profiles (dict): Profiles keyed by student_id.
+        learner_ids (iterable): Optional subset; IDs that are not learners are skipped with a warning.
+
+    Returns:
+        List[str]: Learner IDs in a stable order (needed to resume by chunk number).
+    """
+    if learner_ids is None:
+        return sorted(sid for sid, p in student_profiles.items() if p["role"] == "learner")
+
+    selected = []
+    for sid in sorted(set(learner_ids)):
+        profile = student_profiles.get(sid)
+        if profile is None or profile["role"] != "learner":
+            print(f"Skipping {sid}: not a learner", file=sys.stderr)
+        else:
+            selected.append(sid)
+    return selected
+
+
+def run_signature(mode, preferences, k, chunk_size, file_format, output_db=None):
+    """
+    Settings a checkpoint is valid for; a resumed run must produce the same chunks.
+    """
+    return {
+        "mode": mode,
+        "preferences": sorted(key for key, enabled in preferences.items() if enabled),
+        "k": k,
+        "chunk_size": chunk_size,
+        "format": file_format,
+        "output_db": os.path.abspath(output_db) if output_db else None,
+    }
+
+
+def load_checkpoint(output_dir, signature):
+    """
+    Return the learner list and completed chunk numbers from an earlier run with the same settings.
+
+    Returns:
+        Tuple[list, set]: The checkpointed learner IDs (None if there is no checkpoint) and
+        the completed chunk numbers.
+
+    Raises:
+        ValueError: If a checkpoint exists for different settings.
+    """
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return None, set()
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint["signature"] != signature:
+        raise ValueError(f"{path} was written with different settings; use --restart to start over")
+    return checkpoint["learner_ids"], set(checkpoint["completed_chunks"])
+
+
+def save_checkpoint(output_dir, signature, learner_ids, completed_chunks):
+    """
+    Atomically rewrite the checkpoint file.
+    """
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump({
+            "signature": signature,
+            "learner_ids": learner_ids,
+            "completed_chunks": sorted(completed_chunks),
+        }, f)
+    os.replace(path + ".tmp", path)
+
+
+def resume_learners(checkpoint_ids, learner_ids):
+    """
+    Learner order for a resumed run: the checkpointed list, then learners that are new since.
+
+    Keeping the checkpointed order means completed chunk numbers still refer to the same learners.
+    """
+    known = set(checkpoint_ids)
+    return checkpoint_ids + [sid for sid in learner_ids if sid not in known]
+
+
+def write_chunk(rows, path, file_format):
+    """
+    Write one chunk's rows to `path` atomically. Returns the number of rows written.
+    """
+    writer = write_ndjson if file_format == "ndjson" else write_csv
+    out = open_output(path + ".tmp", compress=path.endswith(".gz"))
+    try:
+        count = writer(rows, out)
+    finally:
+        out.close()
+    os.replace(path + ".tmp", path)
+    return count
+
+
+def init_output_db(db_path, restart=False):
+    """
+    Create the batch_matches table in `db_path` (emptying it if restart is set).
+    """
+    with get_connection(db_path) as conn:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS batch_matches (
+            chunk INTEGER NOT NULL,
+            student_id TEXT NOT NULL,
+            match_id TEXT NOT NULL,
+            subject_overlap INTEGER,
+            day_overlap INTEGER,
+            time_overlap_minutes INTEGER,
+            style_match BOOLEAN,
+            goal_match BOOLEAN,
+            personality_match BOOLEAN,
+            total_score REAL
+        );
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_batch_matches_chunk ON batch_matches (chunk)")
+        if restart:
+            conn.execute("DELETE FROM batch_matches")
+    conn.close()
+
+
+def write_chunk_db(rows, db_path, chunk_number):
+    """
+    Replace one chunk's rows in the batch_matches table in a single transaction.
+
+    Returns the number of rows written.
+    """
+    placeholders = ", ".join("?" * (len(MATCH_COLUMNS) + 1))
+    with get_connection(db_path) as conn:
+        conn.execute("DELETE FROM batch_matches WHERE chunk = ?", (chunk_number,))
+        conn.executemany(
+            f"INSERT INTO batch_matches (chunk, {', '.join(MATCH_COLUMNS)}) VALUES ({placeholders})",
+            [(chunk_number, *(row[column] for column in MATCH_COLUMNS)) for row in rows]
+        )
+    conn.close()
+    return len(rows)
+
+
+def run_batch(student_profiles, learner_ids, output_dir, mode="default", preferences=None, k=3,
+              chunk_size=500, file_format="ndjson", compress=False, output_db=None):
+    """
+    Match learners chunk by chunk, skipping chunks completed by an earlier run.
+
+    Args:
+        student_profiles (dict): Profiles keyed by student_id.
+        learner_ids (list): Learners to match, in a stable order (see select_learners).
+        output_dir (str): Directory for chunk files and the checkpoint.
+        mode (str): 'default', 'custom' or 'similarity'.
+        preferences (dict): Preferences for custom mode.
+        k (int): Matches per learner.
+        chunk_size (int): Learners per chunk.
+        file_format (str): 'ndjson' or 'csv'.
+        compress (bool): Gzip chunk files.
+        output_db (str): Optional SQLite database to write rows to (batch_matches table)
+            instead of chunk files.
+
+    Returns:
+        dict: learners and rows processed in this run.
+    """
+    preferences = preferences or {}
+    os.makedirs(output_dir, exist_ok=True)
+    signature = run_signature(mode, preferences, k, chunk_size, file_format, output_db)
+    checkpoint_ids, completed = load_checkpoint(output_dir, signature)
+    if checkpoint_ids is not None:
+        learner_ids = resume_learners(checkpoint_ids, learner_ids)
+    if output_db:
+        init_output_db(output_db)
+
+    num_chunks = (len(learner_ids) + chunk_size - 1) // chunk_size
+    if completed:
+        print(f"Resuming: {len(completed)}/{num_chunks} chunks already done", file=sys.stderr)
+
+    tutor_index = tutor_vectors = None
+    with stage_timer("build_index"):
+        if mode == "similarity":
+            tutor_vectors = build_tutor_vectors(student_profiles)
+        else:
+            tutor_index = build_availability_index(student_profiles, role="tutor")
+
+    totals = {"learners": 0, "rows": 0}
+    extension = f".{file_format}" + (".gz" if compress else "")
+    for chunk_number in range(num_chunks):
+        if chunk_number in completed:
+            continue
+        chunk = learner_ids[chunk_number * chunk_size:(chunk_number + 1) * chunk_size]
+        start = time.perf_counter()
+
+        # Learners removed since the checkpoint was written keep their slot but are not matched
+        current = [sid for sid in chunk if student_profiles.get(sid, {}).get("role") == "learner"]
+        with stage_timer("match"):
+            rows = list(iter_matches(
+                student_profiles, mode, preferences, k,
+                learner_ids=current, chunk_size=chunk_size,
+                tutor_index=tutor_index, tutor_vectors=tutor_vectors
+            ))
+        with stage_timer("write"):
+            if output_db:
+                count = write_chunk_db(rows, output_db, chunk_number)
+            else:
+                path = os.path.join(output_dir, f"chunk_{chunk_number:05d}{extension}")
+                count = write_chunk(rows, path, file_format)
+            completed.add(chunk_number)
+            save_checkpoint(output_dir, signature, learner_ids, completed)
+
+        elapsed = time.perf_counter() - start
+        totals["learners"] += len(current)
+        totals["rows"] += count
+        print(
+            f"chunk {chunk_number + 1}/{num_chunks}: {len(current)} learners, {count} rows "
+            f"in {elapsed:.2f}s ({len(current) / elapsed:.0f} learners/sec)",
+            file=sys.stderr
+        )
+    return totals
+
+
+def print_summary(totals, elapsed):
+    print(
+        f"\n{totals['learners']} learners, {totals['rows']} match rows in {elapsed:.2f}s "
+        f"({totals['learners'] / elapsed if elapsed else 0:.0f} learners/sec)",
+        file=sys.stderr
+    )
+    print(f"{'stage':<16}{'seconds':>10}{'calls':>10}", file=sys.stderr)
+    for stage, (seconds, calls) in sorted(get_stage_totals().items(), key=lambda x: -x[1][0]):
+        print(f"{stage:<16}{seconds:>10.3f}{calls:>10}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch-match learners with checkpointed, resumable output.")
+    parser.add_argument("--mode", choices=["default", "custom", "similarity"], default="default")
+    parser.add_argument("--k", type=int, default=3, help="Matches per learner.")
+    parser.add_argument("--learners", help="Comma-separated learner IDs to match (default: all learners).")
+    parser.add_argument("--learners-file", help="File with one learner ID per line.")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Learners per chunk/checkpoint.")
+    parser.add_argument("--output-dir", required=True, help="Directory for chunk files and the checkpoint.")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--gzip", action="store_true", help="Gzip chunk files.")
+    parser.add_argument("--output-db", help="Write matches to a batch_matches table in this SQLite DB "
+                                            "instead of chunk files (the checkpoint stays in --output-dir).")
+    parser.add_argument("--restart", action="store_true", help="Discard an existing checkpoint and start over.")
+    for key in PREFERENCE_KEYS:
+        parser.add_argument(f"--{key}", action="store_true", help=f"Custom mode: match by {key}.")
+    args = parser.parse_args()
+
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+
+    subset = None
+    if args.learners or args.learners_file:
+        subset = [sid.strip() for sid in (args.learners or "").split(",") if sid.strip()]
+        if args.learners_file:
+            with open(args.learners_file) as f:
+                subset.extend(line.strip() for line in f if line.strip())
+
+    if args.restart and os.path.isdir(args.output_dir):
+        for name in os.listdir(args.output_dir):
+            if name == CHECKPOINT_FILE or name.startswith("chunk_"):
+                os.remove(os.path.join(args.output_dir, name))
+        if args.output_db and os.path.exists(args.output_db):
+            init_output_db(args.output_db, restart=True)
+
+    start = time.perf_counter()
+    student_profiles = load_student_profiles(DB_PATH)
+    learner_ids = select_learners(student_profiles, subset)
+    preferences = {key: getattr(args, key) for key in PREFERENCE_KEYS}
+
+    try:
+        totals = run_batch(
+            student_profiles, learner_ids, args.output_dir, mode=args.mode, preferences=preferences,
+            k=args.k, chunk_size=args.chunk_size, file_format=args.format, compress=args.gzip,
+            output_db=args.output_db
+        )
+    except ValueError as e:
+        sys.exit(str(e))
+    print_summary(totals, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Python script to benchmark the Virtual Study Buddy App at different student body sizes.
+
+For every requested size, a synthetic dataset is generated (see generate_data.py) and loaded
+into a fresh SQLite database, then the following are timed:
+- ingest: insert_data.py loading the CSV
+- next_student_id: get_next_student_id
+- load_profiles: load_student_profiles
+- default_match / custom_match: mean seconds per learner over a sample of learners
+- route_*: mean seconds per request for the main Flask routes (Flask test client)
+
+Each size runs in its own process (the app reads its database path from STUDY_BUDDY_DB at
+import time). Results are written as JSON and can be compared against a stored baseline;
+any metric slower than the baseline by more than --tolerance is reported as a regression and
+the script exits with status 1.
+
+The committed baseline (data/benchmarks/baseline.json) covers 10,000 and 100,000 students;
+sizes missing from it are not compared. Timings depend on the machine, so re-record it with
+--save-baseline on the machine the comparison runs on.
+
+Example:
+    python scripts/benchmark.py --sizes 10000,100000 --output bench_results.json --baseline data/benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_BASELINE = os.path.join(BASE_DIR, "data", "benchmarks", "baseline.json")
+ALL_PREFERENCES = {key: True for key in ["subjects", "days", "time", "style", "GPA", "personality"]}
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def run_size(size, workdir, sample, route_requests, seed):
+    """
+    Benchmark one dataset size inside the current process.
+
+    STUDY_BUDDY_DB must already point at <workdir>/study_buddy_<size>.db.
+
+    Returns:
+        dict: {metric: seconds}
+    """
+    sys.path.append(BASE_DIR)
+    sys.path.append(os.path.join(BASE_DIR, "scripts"))
+
+    from generate_data import write_students_csv
+    from insert_data import main as insert_data
+    from setup_db import initialize_database
+    from utils.db_utils import get_next_student_id
+    from utils.match_utils import build_availability_index, custom_match, default_match, load_student_profiles
+
+    csv_path = os.path.join(workdir, f"students_{size}.csv")
+    db_path = os.environ["STUDY_BUDDY_DB"]
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    metrics = {}
+    metrics["generate"], _ = _timed(write_students_csv, csv_path, size, seed=seed)
+    initialize_database(db_path)
+    metrics["ingest"], _ = _timed(insert_data, csv_path, db_path)
+    metrics["next_student_id"], _ = _timed(get_next_student_id, db_path)
+    metrics["load_profiles"], profiles = _timed(load_student_profiles, db_path)
+
+    learners = sorted(sid for sid, p in profiles.items() if p["role"] == "learner")
+    sampled = random.Random(seed).sample(learners, min(sample, len(learners)))
+    metrics["build_index"], tutor_index = _timed(build_availability_index, profiles, "tutor")
+
+    elapsed, _ = _timed(lambda: [default_match(sid, profiles, tutor_index) for sid in sampled])
+    metrics["default_match"] = elapsed / max(len(sampled), 1)
+    elapsed, _ = _timed(lambda: [custom_match(sid, ALL_PREFERENCES, profiles, tutor_index) for sid in sampled])
+    metrics["custom_match"] = elapsed / max(len(sampled), 1)
+
+    from app import create_app
+    client = create_app().test_client()
+    routes = {
+        "route_login": "/",
+        "route_form": "/form",
+        "route_account": "/account/{sid}",
+        "route_api_match": "/api/match/{sid}?mode=custom&subjects=1&days=1&time=1",
+    }
+    for name, route in routes.items():
+        elapsed = 0.0
+        for i in range(route_requests):
+            url = route.format(sid=sampled[i % len(sampled)]) if sampled else route
+            t, response = _timed(client.get, url)
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} returned {response.status_code}")
+            elapsed += t
+        metrics[name] = elapsed / route_requests
+
+    return metrics
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    List metrics that got slower than the baseline by more than `tolerance` (0.25 = 25%).
+
+    Returns:
+        List[dict]: One entry per regression with size, metric, baseline, current and ratio.
+    """
+    regressions = []
+    for size, metrics in results.items():
+        for metric, current in metrics.items():
+            previous = baseline.get(size, {}).get(metric)
+            if not previous:
+                continue
+            ratio = current / previous
+            if ratio > 1 + tolerance:
+                regressions.append({
+                    "size": size,
+                    "metric": metric,
+                    "baseline": previous,
+                    "current": current,
+                    "ratio": round(ratio, 2),
+                })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingest, matching and routes at several sizes.")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated student counts.")
+    parser.add_argument("--sample", type=int, default=200, help="Learners timed per matching mode.")
+    parser.add_argument("--route-requests", type=int, default=20, help="Requests per route.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", help="Directory for generated CSVs and databases (default: temp dir).")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the results JSON.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before flagging.")
+    parser.add_argument("--single-size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single_size:
+        metrics = run_size(args.single_size, args.workdir, args.sample, args.route_requests, args.seed)
+        with open(args.result_file, "w") as f:
+            json.dump(metrics, f)
+        return
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="study_buddy_bench_")
+    os.makedirs(workdir, exist_ok=True)
+
+    results = {}
+    for size in [int(s) for s in args.sizes.split(",")]:
+        result_file = os.path.join(workdir, f"result_{size}.json")
+        env = {
+            **os.environ,
+            "STUDY_BUDDY_DB": os.path.join(workdir, f"study_buddy_{size}.db"),
+            "MATCH_JOB_WORKERS": "0",
+        }
+        subprocess.run([
+            sys.executable, os.path.abspath(__file__),
+            "--single-size", str(size),
+            "--workdir", workdir,
+            "--sample", str(args.sample),
+            "--route-requests", str(args.route_requests),
+            "--seed", str(args.seed),
+            "--result-file", result_file,
+        ], env=env, check=True, stdout=subprocess.DEVNULL)
+        with open(result_file) as f:
+            results[str(size)] = json.load(f)
+        print(f"{size} students: " + ", ".join(f"{k}={v:.4f}s" for k, v in results[str(size)].items()))
+
+    with open(args.output, "w") as f:
+        json.dump({"results": results}, f, indent=2)
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['size']} {r['metric']}: {r['baseline']:.4f}s -> {r['current']:.4f}s (x{r['ratio']})")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+        print(f"Baseline saved to {args.baseline}.")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
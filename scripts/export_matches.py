@@ -0,0 +1,59 @@
+"""
+Python script to export match results for every learner as a stream.
+
+Match rows are produced by a generator, learner by learner, and written to the output as
+soon as they are computed, so memory use does not grow with the number of results.
+Supported formats:
+- ndjson: one JSON object per line
+- csv: header row followed by one row per match
+
+Output goes to stdout by default so reporting jobs can pipe it straight to storage, e.g.
+
+    python scripts/export_matches.py --mode custom --subjects --days --time | gzip > matches.ndjson.gz
+    python scripts/export_matches.py --mode default --format csv --output matches.csv.gz
+
+Paths ending in .gz (or --gzip) are compressed on the fly.
+
+Note:
+- This script assumes the database has been populated (setup_db.py, then insert_data.py).
+"""
+
+import argparse
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import DB_PATH
+from utils.export_utils import PREFERENCE_KEYS, open_output, write_csv, write_ndjson
+from utils.match_utils import iter_matches, load_student_profiles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream match results for all learners.")
+    parser.add_argument("--mode", choices=["default", "custom", "similarity"], default="default")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--k", type=int, default=3, help="Matches per learner.")
+    parser.add_argument("--output", default="-", help="Output path ('-' for stdout).")
+    parser.add_argument("--gzip", action="store_true", help="Gzip the output.")
+    for key in PREFERENCE_KEYS:
+        parser.add_argument(f"--{key}", action="store_true", help=f"Custom mode: match by {key}.")
+    args = parser.parse_args()
+
+    preferences = {key: getattr(args, key) for key in PREFERENCE_KEYS}
+    student_profiles = load_student_profiles(DB_PATH)
+    rows = iter_matches(student_profiles, mode=args.mode, preferences=preferences, k=args.k)
+
+    writer = write_ndjson if args.format == "ndjson" else write_csv
+    out = open_output(args.output, args.gzip)
+    try:
+        count = writer(rows, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"{count} match rows exported.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
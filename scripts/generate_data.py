@@ -0,0 +1,140 @@
+"""
+Python script to generate synthetic student data for scaling tests.
+
+Produces a CSV with the same columns as data/raw/students.csv. Categorical fields (study times,
+personality types, study styles, time zones, experience levels) and first/last names are
+sampled with the frequencies observed in the raw dataset; subjects come from the same subject
+list. GPAs are split around the 3.5 tutor cutoff so the learner/tutor ratio can be controlled.
+
+The generator is seeded, so the same --rows and --seed always produce the same file.
+
+Example:
+    python scripts/generate_data.py --rows 100000 --output data/raw/students_100k.csv
+"""
+
+import argparse
+import csv
+import os
+import random
+from collections import Counter
+
+from utils.time_utils import STUDY_TIME_RANGES, WEEKDAY_MAP
+
+RAW_CSV_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "raw", "students.csv")
+
+CSV_COLUMNS = [
+    "student_name",
+    "student_id",
+    "preferred_subjects",
+    "study_times",
+    "personality_type",
+    "study_style",
+    "timezone",
+    "days_of_wk_avail",
+    "experience_level",
+    "GPA",
+]
+
+
+def load_distributions(csv_path=RAW_CSV_PATH):
+    """
+    Count the value frequencies of each categorical column in the raw dataset.
+
+    Returns:
+        dict: {column: Counter} plus 'first_name', 'last_name' and 'subjects'.
+    """
+    counts = {column: Counter() for column in
+              ("study_times", "personality_type", "study_style", "timezone", "experience_level",
+               "first_name", "last_name", "subjects")}
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            for column in ("study_times", "personality_type", "study_style", "timezone", "experience_level"):
+                counts[column][row[column]] += 1
+            first, _, last = row["student_name"].partition(" ")
+            counts["first_name"][first] += 1
+            counts["last_name"][last or first] += 1
+            for subject in row["preferred_subjects"].split(","):
+                counts["subjects"][subject.strip()] += 1
+
+    # Every study time the app knows about should be possible, even if unseen in the sample
+    for study_time in STUDY_TIME_RANGES:
+        counts["study_times"].setdefault(study_time, 1)
+    return counts
+
+
+def generate_students(n_rows, seed=42, tutor_share=0.25, start_id=1000, distributions=None):
+    """
+    Yield synthetic student rows (dicts keyed by CSV_COLUMNS).
+
+    Args:
+        n_rows (int): Number of students to generate.
+        seed (int): Random seed.
+        tutor_share (float): Share of students with GPA >= 3.5.
+        start_id (int): Numeric part of the first student_id.
+        distributions (dict): Output of load_distributions (loaded from the raw CSV if omitted).
+    """
+    rng = random.Random(seed)
+    distributions = distributions or load_distributions()
+    weighted = {
+        column: (list(counter), list(counter.values()))
+        for column, counter in distributions.items()
+    }
+    subjects, subject_weights = weighted["subjects"]
+    days = list(WEEKDAY_MAP)
+
+    def pick(column):
+        values, weights = weighted[column]
+        return rng.choices(values, weights)[0]
+
+    for i in range(n_rows):
+        n_subjects = rng.randint(1, 3)
+        chosen_subjects = set()
+        while len(chosen_subjects) < n_subjects:
+            chosen_subjects.add(rng.choices(subjects, subject_weights)[0])
+        chosen_days = rng.sample(days, rng.randint(2, 5))
+        chosen_days.sort(key=WEEKDAY_MAP.get)
+
+        if rng.random() < tutor_share:
+            gpa = rng.uniform(3.5, 4.0)
+        else:
+            gpa = rng.uniform(2.5, 3.49)
+
+        yield {
+            "student_name": f"{pick('first_name')} {pick('last_name')}",
+            "student_id": f"stu{start_id + i}",
+            "preferred_subjects": ", ".join(sorted(chosen_subjects)),
+            "study_times": pick("study_times"),
+            "personality_type": pick("personality_type"),
+            "study_style": pick("study_style"),
+            "timezone": pick("timezone"),
+            "days_of_wk_avail": ", ".join(chosen_days),
+            "experience_level": pick("experience_level"),
+            "GPA": f"{min(gpa, 3.99):.2f}",
+        }
+
+
+def write_students_csv(path, n_rows, seed=42, tutor_share=0.25):
+    """
+    Write n_rows synthetic students to a CSV file. Returns the path.
+    """
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(generate_students(n_rows, seed=seed, tutor_share=tutor_share))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic student CSV data.")
+    parser.add_argument("--rows", type=int, required=True, help="Number of students.")
+    parser.add_argument("--output", required=True, help="CSV path to write.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tutor-share", type=float, default=0.25, help="Share of students with GPA >= 3.5.")
+    args = parser.parse_args()
+
+    write_students_csv(args.output, args.rows, seed=args.seed, tutor_share=args.tutor_share)
+    print(f"{args.rows} synthetic students written to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Python script to form study groups for the Virtual Study Buddy App.
+
+Students whose study_style is 'Group' or 'Flexible' are placed into study groups of a
+configurable size (3-6). Every member of a group shares:
+- at least one subject with every other member
+- at least two common UTC study days
+- a common UTC time window of at least `min_overlap_minutes` (default: 60)
+
+Groups are built by greedy seeding rather than exhaustive search: each unassigned student
+seeds a group, candidates are pulled lazily from per-subject day-mask availability indexes,
+and the group grows one member at a time with the candidate that keeps the most common days.
+Only a bounded number of candidates is examined per seed and grouped students are removed
+from the indexes, so the run time grows roughly linearly with the number of students.
+
+Note:
+- This script assumes the database has been populated (setup_db.py, then insert_data.py).
+- Results are printed, and optionally written to a CSV file with --output.
+"""
+
+import argparse
+from collections import defaultdict
+
+import pandas as pd
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import DB_PATH
+from utils.match_utils import (
+    DAY_MASK_POPCOUNT,
+    build_availability_index,
+    encode_day_mask,
+    iter_candidate_ids,
+    load_student_profiles,
+)
+from utils.time_utils import REVERSE_WEEKDAY_MAP, intersect_windows, normalize_window, time_to_minutes
+
+GROUP_STYLES = ("Group", "Flexible")
+MIN_GROUP_SIZE = 3
+MAX_GROUP_SIZE = 6
+
+
+def _remove_from_indexes(subject_indexes, profile, sid, mask):
+    """
+    Drop a grouped student from the availability index of each of their subjects.
+    """
+    window = (time_to_minutes(profile["start_time"]), time_to_minutes(profile["end_time"]))
+    for subject in profile["subjects"]:
+        windows = subject_indexes[subject][mask]
+        windows[window].remove(sid)
+        if not windows[window]:
+            del windows[window]
+        if not windows:
+            del subject_indexes[subject][mask]
+
+
+def form_study_groups(student_profiles, group_size=4, min_overlap_minutes=60, max_candidates=50):
+    """
+    Build study groups from students who prefer group or flexible study.
+
+    Args:
+        student_profiles (dict): Profiles keyed by student_id (see load_student_profiles).
+        group_size (int): Target group size, between 3 and 6.
+        min_overlap_minutes (int): Minimum common UTC time window for the whole group.
+        max_candidates (int): Maximum number of candidates examined per seed.
+
+    Returns:
+        List[dict]: One dictionary per group with:
+            - 'group_id': Sequential group number
+            - 'member_ids': List of student IDs
+            - 'subjects': Subjects shared by every member
+            - 'days': UTC days shared by every member
+            - 'utc_start_time' / 'utc_end_time': Common UTC time window
+    """
+    if not MIN_GROUP_SIZE <= group_size <= MAX_GROUP_SIZE:
+        raise ValueError(f"group_size must be between {MIN_GROUP_SIZE} and {MAX_GROUP_SIZE}")
+
+    eligible = {
+        sid: profile for sid, profile in student_profiles.items()
+        if profile["style"] in GROUP_STYLES and profile["subjects"]
+    }
+    # One availability index per subject, so every candidate already shares a subject with the seed
+    subject_members = defaultdict(dict)
+    for sid, profile in eligible.items():
+        for subject in profile["subjects"]:
+            subject_members[subject][sid] = profile
+    subject_indexes = {
+        subject: build_availability_index(members, role=None) for subject, members in subject_members.items()
+    }
+
+    masks = {sid: encode_day_mask(profile["days"]) for sid, profile in eligible.items()}
+    # Windows past midnight end after 24:00 so common windows can be intersected directly
+    windows = {
+        sid: normalize_window(time_to_minutes(profile["start_time"]), time_to_minutes(profile["end_time"]))
+        for sid, profile in eligible.items()
+    }
+
+    assigned = set()
+    groups = []
+
+    # Seed with the most constrained students first so they are not left out
+    for seed in sorted(eligible, key=lambda sid: (DAY_MASK_POPCOUNT[masks[sid]], sid)):
+        if seed in assigned:
+            continue
+
+        seed_profile = eligible[seed]
+        candidates = []
+        seen = {seed}
+        for subject in sorted(seed_profile["subjects"]):
+            for sid in iter_candidate_ids(subject_indexes[subject], seed_profile, 2, min_overlap_minutes):
+                if sid not in seen:
+                    seen.add(sid)
+                    candidates.append(sid)
+                    if len(candidates) >= max_candidates:
+                        break
+            if len(candidates) >= max_candidates:
+                break
+        if len(candidates) < MIN_GROUP_SIZE - 1:
+            continue
+
+        members = [seed]
+        common_subjects = set(seed_profile["subjects"])
+        common_mask = masks[seed]
+        start, end = windows[seed]
+        # Line each candidate's window up with the seed's once (windows may wrap past midnight);
+        # the group window only shrinks inside the seed's, so plain max/min work from here on
+        pool = [
+            (sid, eligible[sid]["subjects"], masks[sid], intersect_windows((start, end), windows[sid]))
+            for sid in candidates
+        ]
+
+        while len(members) < group_size:
+            best = None
+            best_key = None
+            for entry in pool:
+                sid, subjects, mask, (cand_start, cand_end) = entry
+                window_start, window_end = max(start, cand_start), min(end, cand_end)
+                if window_end - window_start < min_overlap_minutes:
+                    continue
+                shared_days = DAY_MASK_POPCOUNT[common_mask & mask]
+                if shared_days < 2:
+                    continue
+                shared_subjects = len(common_subjects & subjects)
+                if not shared_subjects:
+                    continue
+                key = (shared_days, shared_subjects, window_end - window_start)
+                if best_key is None or key > best_key:
+                    best, best_key = entry, key
+            if best is None:
+                break
+
+            pool.remove(best)
+            sid, subjects, mask, (cand_start, cand_end) = best
+            members.append(sid)
+            common_subjects &= subjects
+            common_mask &= mask
+            start, end = max(start, cand_start), min(end, cand_end)
+
+        if len(members) < MIN_GROUP_SIZE:
+            continue
+
+        assigned.update(members)
+        for sid in members:
+            _remove_from_indexes(subject_indexes, eligible[sid], sid, masks[sid])
+        groups.append({
+            "group_id": len(groups) + 1,
+            "member_ids": members,
+            "subjects": sorted(common_subjects),
+            "days": [REVERSE_WEEKDAY_MAP[i] for i in range(7) if common_mask & (1 << i)],
+            "utc_start_time": f"{start // 60 % 24:02d}:{start % 60:02d}",
+            "utc_end_time": f"{end // 60 % 24:02d}:{end % 60:02d}",
+        })
+
+    return groups
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Form study groups for Group/Flexible students.")
+    parser.add_argument("--size", type=int, default=4, help="Target group size (3-6).")
+    parser.add_argument("--min-overlap", type=int, default=60, help="Minimum common time window in minutes.")
+    parser.add_argument("--output", help="Optional CSV path to write the groups to.")
+    args = parser.parse_args()
+
+    student_profiles = load_student_profiles(DB_PATH)
+    groups = form_study_groups(student_profiles, group_size=args.size, min_overlap_minutes=args.min_overlap)
+
+    df = pd.DataFrame(groups)
+    if args.output:
+        df.to_csv(args.output, index=False)
+
+    grouped = sum(len(group["member_ids"]) for group in groups)
+    print(f"{len(groups)} study groups formed covering {grouped} students.")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ This script loads student data from a CSV file and inserts it into the database.
 - utc_study_days: converted weekday availability in UTC
 - subjects: list of subjects (created dynamically from student preferences)
 - student_subjects: links each student to their preferred subjects (many-to-many)
+- change_log: the inserted students (one "every student" row for large imports), so a running app reloads their cached profiles
 
 Timezone conversions and study time ranges are handled automatically using utility functions.
 
@@ -27,6 +28,7 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from config import DB_PATH
+from utils.change_feed import record_changes
 from utils.db_utils import get_or_create_subject
 from utils.time_utils import (
     STUDY_TIME_RANGES,
@@ -36,10 +38,10 @@ from utils.time_utils import (
 )
 
 
-def main():
+def main(csv_path=None, db_path=None):
     base_dir = os.path.dirname(__file__)
-    csv_path = os.path.join(base_dir, "..", "data", "raw", "students.csv")
-    db_path = os.path.join(base_dir, "..", "data", "processed", "study_buddy.db")
+    csv_path = csv_path or os.path.join(base_dir, "..", "data", "raw", "students.csv")
+    db_path = db_path or os.path.join(base_dir, "..", "data", "processed", "study_buddy.db")
 
     df = pd.read_csv(csv_path)
 
@@ -96,6 +98,9 @@ def main():
                     (row["student_id"], subject_id),
                 )
 
+        # Tell running app workers which cached profiles to reload (same transaction)
+        record_changes(cursor, "student", df["student_id"].tolist())
+
     print(
         f"{success_count} students successfully inserted or replaced in the database."
     )
@@ -54,6 +54,14 @@ import sqlite3
 import pandas as pd
 from datetime import datetime
 
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.match_utils import build_availability_index, get_candidate_ids
+from utils.time_utils import time_to_minutes, window_overlap_minutes
+from utils.similarity_utils import similarity_match, generate_all_similarity_matches
+
 
 # ### Connect to Database
 
@@ -100,13 +108,10 @@ df_utc_study_days = pd.read_sql("SELECT * FROM utc_study_days", conn)
 
 # Utility function to check if two time ranges overlap by at least 60 minutes
 def get_time_overlap_minutes(start1, end1, start2, end2, min_overlap_minutes=30):
-    fmt = "%H:%M"
-    s1, e1 = datetime.strptime(start1, fmt), datetime.strptime(end1, fmt)
-    s2, e2 = datetime.strptime(start2, fmt), datetime.strptime(end2, fmt)
-    latest_start = max(s1, s2)
-    earliest_end = min(e1, e2)
-    overlap = (earliest_end - latest_start).total_seconds() / 60  # in minutes
-    return max(0, overlap)
+    # Windows ending at or before they start run past midnight, so overlap is measured modulo 24h
+    return window_overlap_minutes(
+        time_to_minutes(start1), time_to_minutes(end1), time_to_minutes(start2), time_to_minutes(end2)
+    )
 
 
 # ## Default Mode Matching Logic
@@ -175,6 +180,17 @@ from collections import Counter
 Counter([profile["role"] for profile in student_profiles.values()])  # Check the distribution of roles
 
 
+# ### Build availability index
+# 
+# Tutors are bucketed by their UTC day mask (7 bits, one per weekday) and UTC study window. When a learner is matched, only the buckets sharing at least 2 days with the learner's mask (and, where required, overlapping in time) are visited, so most tutors are pruned before any scoring happens.
+
+# In[ ]:
+
+
+# Index tutors by day mask and study window
+tutor_index = build_availability_index(student_profiles, role="tutor")
+
+
 # ### Compute match scores
 
 # In[116]:
@@ -198,10 +214,13 @@ for sid in student_ids:
     sid_end_time = student_profiles[sid]["end_time"]
     sid_style = student_profiles[sid]["style"]
 
+    # Only tutors sharing at least 2 UTC days and 60+ minutes of time are considered
+    candidate_ids = get_candidate_ids(tutor_index, student_profiles[sid], min_common_days=2, min_overlap_minutes=60)
+
     # Initialize match details, loop through potential matches
-    for partner_id in student_ids or student_profiles[partner_id]["role"] != "tutor":
+    for partner_id in candidate_ids:
         if sid == partner_id:
-            continue  # Skip matching with self and non-tutors
+            continue  # Skip matching with self
 
         # Get the partner's profile
         partner_subjects = student_profiles[partner_id]["subjects"]
@@ -292,6 +311,9 @@ def custom_match(user_id, preferences):
     Only users with the role "learner" can be matched, and only users with the role "tutor" are considered
     as valid matches.
 
+    When 'days' is selected, candidates are taken from `tutor_index` so tutors sharing fewer than 2 UTC
+    days are skipped without being scored.
+
     Parameters:
         user_id (int): The learner's unique ID to find tutor matches for.
         preferences (dict): A dictionary specifying which criteria to include in the match score.
@@ -338,8 +360,19 @@ def custom_match(user_id, preferences):
 
     results = []
 
-    # Loop through all other students to find matches
-    for partner_id, partner in student_profiles.items():
+    # With 'days' enabled, start from the tutors sharing at least 2 UTC days
+    # (fall back to every tutor if the index leaves fewer than 3 candidates)
+    candidate_ids = None
+    if preferences.get('days'):
+        candidate_ids = get_candidate_ids(tutor_index, user_profile, min_common_days=2)
+        if len(candidate_ids) < 3:
+            candidate_ids = None
+    if candidate_ids is None:
+        candidate_ids = list(student_profiles)
+
+    # Loop through the candidate students to find matches
+    for partner_id in candidate_ids:
+        partner = student_profiles[partner_id]
         if partner_id == user_id or partner["role"] != "tutor":
             continue  # Skip self and non-tutors
 
@@ -476,3 +509,24 @@ custom_matches_df
 # 
 # **Note**: Time overlap is only considered if there are at least **two common days**. This was done to reduce false positives and create more meaningful matches.
 # 
+# 
+
+# ## Similarity-Vector Matching
+# 
+# Integer scores produce many ties, so the cut to the top 3 is often arbitrary. This alternative ranking engine encodes every profile as a numeric feature vector (subject one-hot, UTC day mask, availability minutes per UTC hour, study style, MBTI dimensions and GPA) and ranks tutors by weighted cosine similarity.
+# 
+# Similarities are computed as blocked matrix products, keeping only the top k per block, so memory stays bounded for very large student bodies. The output has the same columns as `custom_match`; `total_score` holds the similarity (0-1).
+
+# In[ ]:
+
+
+# Top 3 tutors for a single learner
+similarity_match("stu1000", student_profiles)
+
+
+# In[ ]:
+
+
+# Top 3 tutors for every learner, with a heavier weight on shared availability
+similarity_matches_df = generate_all_similarity_matches(student_profiles, k=3, weights={'days': 2.0, 'time': 2.0})
+similarity_matches_df
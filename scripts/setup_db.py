@@ -7,9 +7,12 @@ This script sets up the core database schema, including the following tables:
 - student_subjects: maps students to their preferred subjects (many-to-many)
 - study_days: stores students’ preferred study days (local time)
 - utc_study_days: stores preferred study days converted to UTC for global matching
-
-Optional tables like messages and notifications are defined in the code but commented out
-until needed.
+- match_jobs: background whole-population matching jobs and their progress
+- user_sessions: server-side login sessions (hashed tokens with expiry)
+- change_log: versioned feed of student and subject changes used to invalidate caches
+- notifications: outbox of notifications waiting to be delivered by the dispatcher
+- messages: chat messages between matched students
+- scheduled_sessions: weekly recurring study sessions between two students
 
 Note: This script only sets up the database schema. Data import from the CSV file and any
 matching or messaging logic should be handled in separate scripts.
@@ -20,9 +23,10 @@ Run this script once to initialize the database structure. Re-run only if schema
 import sqlite3
 import os
 
-def initialize_database():
-    base_dir = os.path.dirname(__file__)
-    db_path = os.path.join(base_dir, '..', 'data', 'processed', 'study_buddy.db')
+def initialize_database(db_path=None):
+    if db_path is None:
+        base_dir = os.path.dirname(__file__)
+        db_path = os.path.join(base_dir, '..', 'data', 'processed', 'study_buddy.db')
 
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
@@ -86,49 +90,128 @@ def initialize_database():
     );
     """)
 
-    # NOTE: Messaging and notification features are defined below but
-    #       disabled for the MVP. Uncomment them when ready to use.
-    # # Messages table 
-    # cursor.execute('''
-    # CREATE TABLE IF NOT EXISTS messages (
-    #     message_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    #     sender_id TEXT,
-    #     receiver_id TEXT,
-    #     content TEXT,
-    #     timestamp TEXT,
-    #     FOREIGN KEY(sender_id) REFERENCES students(student_id),
-    #     FOREIGN KEY(receiver_id) REFERENCES students(student_id)
-    # )
-    # ''')
-    
-    # Scheduled study sessions
-    # cursor.execute("""
-    # CREATE TABLE IF NOT EXISTS scheduled_sessions (
-    #     session_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    #     host_student_id TEXT NOT NULL,
-    #     guest_student_id TEXT,
-    #     day TEXT NOT NULL,
-    #     start_time TEXT NOT NULL,
-    #     end_time TEXT NOT NULL,
-    #     status TEXT DEFAULT 'pending',
-    #     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-    #     FOREIGN KEY (host_student_id) REFERENCES students(student_id),
-    #     FOREIGN KEY (guest_student_id) REFERENCES students(student_id)
-    # );
-    # """)
-    
-    # Notifications table (optional feature)
-    # cursor.execute('''
-    # CREATE TABLE IF NOT EXISTS notifications (
-    #      notification_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    #      student_id TEXT,
-    #      type TEXT,
-    #      content TEXT,
-    #      status TEXT,
-    #      timestamp TEXT,
-    #      FOREIGN KEY(student_id) REFERENCES students(student_id)
-    #  )
-    #  ''')
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS match_jobs (
+        job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        mode TEXT NOT NULL,
+        preferences TEXT NOT NULL,
+        k INTEGER NOT NULL,
+        dedupe_key TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending'
+            CHECK (status IN ('pending', 'running', 'done', 'failed')),
+        progress INTEGER NOT NULL DEFAULT 0,
+        total INTEGER,
+        result_path TEXT,
+        error TEXT,
+        worker_id TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        heartbeat_at DATETIME,
+        finished_at DATETIME
+    );
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS user_sessions (
+        token_hash TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        student_id TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        expires_at REAL NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users(user_id)
+    );
+    """)
+
+    # Only one pending/running job per mode + preferences + k
+    cursor.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_match_jobs_active
+    ON match_jobs (dedupe_key) WHERE status IN ('pending', 'running');
+    """)
+
+    # Change feed: one row per student/subject mutation, written in the same transaction,
+    # so each worker process can tell which cached data is out of date
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS change_log (
+        version INTEGER PRIMARY KEY AUTOINCREMENT,
+        entity TEXT NOT NULL CHECK (entity IN ('student', 'subject')),
+        student_id TEXT,
+        changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+
+    # Messages between matched students. conversation_id is the two student IDs in sorted
+    # order joined by ':', so both directions of a chat share one index range; message_id
+    # increases with time and is the pagination cursor.
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS messages (
+        message_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        conversation_id TEXT NOT NULL,
+        sender_id TEXT,
+        receiver_id TEXT,
+        content TEXT,
+        timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(sender_id) REFERENCES students(student_id),
+        FOREIGN KEY(receiver_id) REFERENCES students(student_id)
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_messages_conversation
+    ON messages (conversation_id, message_id)
+    ''')
+
+    # Weekly recurring study sessions. day/start_time/end_time are UTC; start_minute and
+    # end_minute are the same interval as minutes of the week (Mon 00:00 = 0) so overlap
+    # checks are indexed range queries instead of string comparisons over every session.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS scheduled_sessions (
+        session_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        host_student_id TEXT NOT NULL,
+        guest_student_id TEXT,
+        day TEXT NOT NULL,
+        start_time TEXT NOT NULL,
+        end_time TEXT NOT NULL,
+        start_minute INTEGER NOT NULL,
+        end_minute INTEGER NOT NULL,
+        status TEXT DEFAULT 'pending',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (host_student_id) REFERENCES students(student_id),
+        FOREIGN KEY (guest_student_id) REFERENCES students(student_id)
+    );
+    """)
+
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_sessions_host
+    ON scheduled_sessions (host_student_id, start_minute);
+    """)
+
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_sessions_guest
+    ON scheduled_sessions (guest_student_id, start_minute);
+    """)
+
+    # Notifications outbox: rows are queued in the triggering transaction and
+    # delivered later by the notification dispatcher
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS notifications (
+        notification_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id TEXT,
+        type TEXT,
+        content TEXT,
+        status TEXT DEFAULT 'pending'
+            CHECK (status IN ('pending', 'sent', 'failed')),
+        timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL DEFAULT 0,
+        delivered_at TEXT,
+        FOREIGN KEY(student_id) REFERENCES students(student_id)
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_notifications_pending
+    ON notifications (status, next_attempt_at)
+    ''')
 
     conn.commit()
     conn.close()
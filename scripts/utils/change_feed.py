@@ -0,0 +1,108 @@
+import sqlite3
+import threading
+from collections import defaultdict
+
+from config import DB_PATH
+from utils.metrics_utils import describe, inc
+
+# change_log keeps only this many recent rows; a process that falls further behind reloads everything
+CHANGE_LOG_MAX_ROWS = 10000
+
+# Batches with more students than this (e.g. insert_data.py imports) are logged as a single
+# row with student_id NULL, meaning "every student"
+MAX_LOGGED_STUDENTS = 500
+
+_lock = threading.Lock()
+_listeners = []
+_conn = None              # long-lived connection used for PRAGMA data_version and change reads
+_data_version = None
+_last_version = 0
+
+describe("study_buddy_change_feed_rows_total", "change_log rows applied by this process.")
+
+
+def record_changes(cursor, entity, student_ids=(None,)):
+    """
+    Log changed students or subjects inside the caller's transaction.
+
+    Rows older than the last CHANGE_LOG_MAX_ROWS are pruned in the same transaction (a range
+    delete on the primary key), so the log stays small.
+
+    Args:
+        cursor: SQLite cursor object (inside the transaction making the change).
+        entity (str): 'student' or 'subject'.
+        student_ids (iterable): Affected student IDs (None for subject changes or for every student).
+    """
+    student_ids = list(student_ids)
+    if not student_ids:
+        return
+    if len(student_ids) > MAX_LOGGED_STUDENTS:
+        student_ids = [None]
+    cursor.executemany(
+        "INSERT INTO change_log (entity, student_id) VALUES (?, ?)",
+        [(entity, student_id) for student_id in student_ids]
+    )
+    cursor.execute("DELETE FROM change_log WHERE version <= last_insert_rowid() - ?", (CHANGE_LOG_MAX_ROWS,))
+
+
+def add_listener(callback):
+    """
+    Call `callback(changes)` for every batch of new changes, where `changes` maps entity
+    ('student', 'subject') to the set of affected student IDs. A None student ID means every
+    student may have changed, so listeners should reload everything.
+    """
+    _listeners.append(callback)
+
+
+def start_change_feed():
+    """
+    Start following the change log from its current end.
+
+    Call this before any cache is filled, so every change after the caches were loaded is seen.
+    """
+    global _conn, _data_version, _last_version
+    with _lock:
+        if _conn is not None:
+            return
+        _conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        _data_version = _conn.execute("PRAGMA data_version").fetchone()[0]
+        _last_version = _conn.execute("SELECT COALESCE(MAX(version), 0) FROM change_log").fetchone()[0]
+
+
+def poll_changes():
+    """
+    Apply changes committed by any connection (other workers, insert_data.py) since the last poll.
+
+    PRAGMA data_version only moves when another connection commits, so a poll with nothing new
+    is one cheap query; otherwise only the new change_log rows are read and passed to the
+    listeners, which invalidate or reload just what changed. If this process fell behind
+    further than the log keeps, listeners are told that everything changed.
+    """
+    global _data_version, _last_version
+    if _conn is None:
+        return
+    with _lock:
+        data_version = _conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == _data_version:
+            return
+        _data_version = data_version
+        oldest, newest = _conn.execute("SELECT MIN(version), MAX(version) FROM change_log").fetchone()
+        if newest is None or newest <= _last_version:
+            return
+
+        changes = defaultdict(set)
+        if oldest > _last_version + 1:
+            # Rows this process had not read yet were pruned, so anything may have changed
+            changes["student"].add(None)
+            changes["subject"].add(None)
+        else:
+            rows = _conn.execute(
+                "SELECT entity, student_id FROM change_log WHERE version > ? AND version <= ?",
+                (_last_version, newest)
+            ).fetchall()
+            inc("study_buddy_change_feed_rows_total", amount=len(rows))
+            for entity, student_id in rows:
+                changes[entity].add(student_id)
+        _last_version = newest
+        for callback in _listeners:
+            callback(changes)
@@ -2,10 +2,26 @@ import sqlite3
 import os
 
 from config import DB_PATH
+from utils.change_feed import record_changes
+from utils.metrics_utils import InstrumentedConnection
+
+def get_connection(db_path=DB_PATH):
+    """
+    Open a SQLite connection whose queries are counted and timed for the metrics endpoint.
+
+    Args:
+        db_path (str): Path to the SQLite database.
+
+    Returns:
+        sqlite3.Connection: Usable as a context manager like sqlite3.connect.
+    """
+    return sqlite3.connect(db_path, factory=InstrumentedConnection)
 
 def get_or_create_subject(cursor, subject_name):
     """
     Retrieve subject_id for a given subject name, inserting it if not found.
+
+    New subjects are recorded in the change log in the same transaction.
     
     Args:
         cursor: SQLite cursor object.
@@ -19,19 +35,24 @@ def get_or_create_subject(cursor, subject_name):
     if result:
         return result[0]
     cursor.execute("INSERT INTO subjects (subject_name) VALUES (?)", (subject_name,))
-    return cursor.lastrowid
+    subject_id = cursor.lastrowid
+    record_changes(cursor, "subject")
+    return subject_id
 
-def get_next_student_id():
+def get_next_student_id(db_path=DB_PATH):
     """
     Generate the next available student ID based on the existing IDs in the database.
 
     Assumes that student IDs are stored as strings with the format 'stu####',
     where #### is a numeric value (e.g., 'stu1000', 'stu1001', etc.).
 
+    Args:
+        db_path (str): Path to the SQLite database.
+
     Returns:
         str: The next student ID in the sequence (e.g., 'stu1155' if 'stu1154' is the highest).
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with sqlite3.connect(db_path) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT student_id FROM students")
         ids = [int(row[0][3:]) for row in cursor.fetchall()]
@@ -0,0 +1,46 @@
+import csv
+import gzip
+import json
+import sys
+
+from utils.match_utils import MATCH_COLUMNS
+
+PREFERENCE_KEYS = ["subjects", "days", "time", "style", "GPA", "personality"]
+
+
+def write_ndjson(rows, out):
+    """
+    Write match rows as newline-delimited JSON. Returns the number of rows written.
+    """
+    count = 0
+    for row in rows:
+        out.write(json.dumps(row, default=str))
+        out.write("\n")
+        count += 1
+    return count
+
+
+def write_csv(rows, out):
+    """
+    Write match rows as CSV with a header row. Returns the number of rows written.
+    """
+    writer = csv.DictWriter(out, fieldnames=MATCH_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def open_output(path, compress=False):
+    """
+    Open the export target for text writing (stdout for '-', gzip for .gz paths or compress=True).
+    """
+    if path == "-":
+        if compress:
+            return gzip.open(sys.stdout.buffer, "wt", newline="")
+        return sys.stdout
+    if compress or path.endswith(".gz"):
+        return gzip.open(path, "wt", newline="", encoding="utf-8")
+    return open(path, "w", newline="", encoding="utf-8")
@@ -0,0 +1,351 @@
+import gzip
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+
+from config import DB_PATH, MATCH_JOB_RESULTS_DIR
+from utils.match_utils import build_availability_index, iter_matches, load_student_profiles
+from utils.notification_utils import queue_match_notifications
+from utils.similarity_utils import build_tutor_vectors
+
+logger = logging.getLogger(__name__)
+
+# Learners processed between progress/heartbeat updates
+JOB_CHUNK_SIZE = 200
+
+# "new_match" notifications inserted per transaction once a job is done
+NOTIFY_CHUNK_SIZE = 1000
+
+# A running job whose heartbeat is older than this was left behind by a dead worker
+STALE_JOB_SECONDS = 300
+
+# Running jobs refresh their heartbeat this often, independently of chunk progress
+HEARTBEAT_INTERVAL_SECONDS = 30
+
+# A job abandoned this many times is marked failed instead of being claimed again
+MAX_JOB_ATTEMPTS = 3
+
+POLL_INTERVAL_SECONDS = 1.0
+WORKER_BACKOFF_MAX_SECONDS = 60
+
+
+class JobLost(Exception):
+    """
+    Raised when a job this worker was running has been reclaimed by another worker.
+    """
+
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def enqueue_match_job(mode="default", preferences=None, k=3):
+    """
+    Queue a whole-population match job, or return the job already queued/running for the same request.
+
+    Args:
+        mode (str): 'default', 'custom' or 'similarity'.
+        preferences (dict): Preferences for custom mode.
+        k (int): Matches per learner.
+
+    Returns:
+        tuple: (job_id, created) where created is False if an active duplicate was found.
+    """
+    enabled = sorted(key for key, value in (preferences or {}).items() if value)
+    dedupe_key = json.dumps([mode, enabled if mode == "custom" else [], k])
+
+    with _connect() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "INSERT INTO match_jobs (mode, preferences, k, dedupe_key) VALUES (?, ?, ?, ?)",
+                (mode, json.dumps(enabled), k, dedupe_key)
+            )
+            return cursor.lastrowid, True
+        except sqlite3.IntegrityError:
+            # The partial unique index allows one pending/running job per dedupe_key
+            cursor.execute(
+                "SELECT job_id FROM match_jobs WHERE dedupe_key = ? AND status IN ('pending', 'running')",
+                (dedupe_key,)
+            )
+            return cursor.fetchone()[0], False
+
+
+def get_match_job(job_id):
+    """
+    Return a job row as a dictionary, or None if it does not exist.
+    """
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM match_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def claim_next_job(worker_id):
+    """
+    Atomically mark the oldest pending (or abandoned running) job as running by this worker.
+
+    Abandoned jobs that already used MAX_JOB_ATTEMPTS attempts are marked failed in the same
+    transaction instead, so a job that keeps killing its workers is not retried forever.
+
+    Returns:
+        dict or None: The claimed job (with worker_id set to this worker).
+    """
+    conn = _connect()
+    try:
+        conn.isolation_level = None
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(f"""
+            UPDATE match_jobs
+            SET status = 'failed', error = 'Abandoned by its worker ' || attempts || ' times',
+                finished_at = datetime('now')
+            WHERE status = 'running' AND attempts >= ?
+              AND heartbeat_at < datetime('now', '-{STALE_JOB_SECONDS} seconds')
+        """, (MAX_JOB_ATTEMPTS,))
+        row = conn.execute(f"""
+            SELECT * FROM match_jobs
+            WHERE status = 'pending'
+               OR (status = 'running' AND heartbeat_at < datetime('now', '-{STALE_JOB_SECONDS} seconds'))
+            ORDER BY job_id
+            LIMIT 1
+        """).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute("""
+            UPDATE match_jobs
+            SET status = 'running', worker_id = ?, progress = 0, attempts = attempts + 1,
+                heartbeat_at = datetime('now')
+            WHERE job_id = ?
+        """, (worker_id, row["job_id"]))
+        conn.execute("COMMIT")
+        return {**dict(row), "status": "running", "worker_id": worker_id}
+    finally:
+        conn.close()
+
+
+def _update_owned(conn, job, sql, params):
+    """
+    Run an UPDATE on the job row only while this worker still owns it.
+
+    `sql` must end with "WHERE job_id = ?"; the ownership check is appended to it.
+
+    Raises:
+        JobLost: If the job was reclaimed by another worker.
+    """
+    cursor = conn.execute(
+        sql + " AND worker_id = ? AND status = 'running'", (*params, job["job_id"], job["worker_id"])
+    )
+    if cursor.rowcount == 0:
+        raise JobLost(f"Job {job['job_id']} is no longer owned by {job['worker_id']}")
+
+
+def _previous_result_path(job):
+    """
+    Result file of the latest finished job with the same mode, preferences and k, if any.
+    """
+    with _connect() as conn:
+        row = conn.execute("""
+            SELECT result_path FROM match_jobs
+            WHERE dedupe_key = ? AND status = 'done' AND job_id != ?
+            ORDER BY job_id DESC
+            LIMIT 1
+        """, (job["dedupe_key"], job["job_id"])).fetchone()
+    if row is None or not row["result_path"] or not os.path.exists(row["result_path"]):
+        return None
+    return row["result_path"]
+
+
+def _read_pairs(path):
+    """
+    Yield (student_id, match_id) from a job result file, in file (learner ID) order.
+    """
+    if path is None:
+        return
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            yield row["student_id"], row["match_id"]
+
+
+@contextmanager
+def _heartbeat(job):
+    """
+    Refresh the job's heartbeat every HEARTBEAT_INTERVAL_SECONDS on a background thread.
+
+    Keeps the job from looking abandoned while a slow step (loading profiles, building the
+    index, a large chunk) runs. Stops beating once the job is no longer owned by this worker.
+    """
+    stop_event = threading.Event()
+
+    def beat():
+        while not stop_event.wait(HEARTBEAT_INTERVAL_SECONDS):
+            try:
+                with _connect() as conn:
+                    _update_owned(conn, job, "UPDATE match_jobs SET heartbeat_at = datetime('now') WHERE job_id = ?", ())
+            except JobLost:
+                return
+            except sqlite3.Error:
+                logger.exception("Heartbeat for match job %s failed", job["job_id"])
+
+    thread = threading.Thread(target=beat, name=f"match-job-{job['job_id']}-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop_event.set()
+        thread.join()
+
+
+def _queue_new_matches(pairs_path):
+    """
+    Queue "new_match" notifications from a tab-separated pairs file, NOTIFY_CHUNK_SIZE per transaction.
+
+    Short transactions keep the write lock free for registrations in between.
+    """
+    with open(pairs_path, encoding="utf-8") as f:
+        while True:
+            chunk = [line.rstrip("\n").split("\t") for line in itertools.islice(f, NOTIFY_CHUNK_SIZE)]
+            if not chunk:
+                return
+            with _connect() as conn:
+                queue_match_notifications(conn, chunk)
+
+
+def run_match_job(job):
+    """
+    Run a claimed job, streaming results to a gzipped NDJSON file and recording progress.
+
+    Only pairs that were not in the previous run's results (same mode, preferences and k) get a
+    "new_match" notification. Both files are in learner ID order, so the previous results are
+    read alongside the new ones chunk by chunk and memory stays bounded by the chunk size. New
+    pairs are spilled to a temporary file and queued in short transactions after the job is
+    marked done, so a failed job never notifies anyone.
+
+    Every update checks that the job is still owned by job["worker_id"]. A worker whose
+    heartbeat went stale and whose job was reclaimed stops at its next progress update
+    without touching the job row, and each attempt writes its own temporary files, so it
+    never clobbers the new owner's output. The heartbeat is refreshed by a timer thread
+    while the job runs.
+    """
+    job_id = job["job_id"]
+    preferences = {key: True for key in json.loads(job["preferences"])}
+    os.makedirs(MATCH_JOB_RESULTS_DIR, exist_ok=True)
+    result_path = os.path.join(MATCH_JOB_RESULTS_DIR, f"match_job_{job_id}.ndjson.gz")
+    tmp_path = f"{result_path}.{job['worker_id']}.tmp"
+    new_pairs_path = f"{result_path}.{job['worker_id']}.new.tmp"
+
+    try:
+        with _heartbeat(job):
+            student_profiles = load_student_profiles(DB_PATH)
+            learner_ids = sorted(sid for sid, p in student_profiles.items() if p["role"] == "learner")
+            with _connect() as conn:
+                _update_owned(conn, job, "UPDATE match_jobs SET total = ? WHERE job_id = ?", (len(learner_ids),))
+
+            # Built once for the whole job instead of once per chunk
+            tutor_index = tutor_vectors = None
+            if job["mode"] == "similarity":
+                tutor_vectors = build_tutor_vectors(student_profiles)
+            else:
+                tutor_index = build_availability_index(student_profiles, role="tutor")
+
+            previous = _read_pairs(_previous_result_path(job))
+            next_previous = next(previous, None)
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as out, \
+                    open(new_pairs_path, "w", encoding="utf-8") as new_pairs:
+                for start in range(0, len(learner_ids), JOB_CHUNK_SIZE):
+                    chunk = learner_ids[start:start + JOB_CHUNK_SIZE]
+                    old_pairs = set()
+                    while next_previous is not None and next_previous[0] <= chunk[-1]:
+                        old_pairs.add(next_previous)
+                        next_previous = next(previous, None)
+
+                    for row in iter_matches(
+                        student_profiles, job["mode"], preferences, job["k"], learner_ids=chunk,
+                        tutor_index=tutor_index, tutor_vectors=tutor_vectors
+                    ):
+                        out.write(json.dumps(row, default=str))
+                        out.write("\n")
+                        if (row["student_id"], row["match_id"]) not in old_pairs:
+                            new_pairs.write(f"{row['student_id']}\t{row['match_id']}\n")
+                    with _connect() as conn:
+                        _update_owned(
+                            conn, job,
+                            "UPDATE match_jobs SET progress = ?, heartbeat_at = datetime('now') WHERE job_id = ?",
+                            (start + len(chunk),)
+                        )
+            previous.close()
+
+            with _connect() as conn:
+                _update_owned(conn, job, """
+                    UPDATE match_jobs
+                    SET status = 'done', result_path = ?, finished_at = datetime('now')
+                    WHERE job_id = ?""", (result_path,))
+                # Still inside the transaction, so the file is only published by the owner
+                os.replace(tmp_path, result_path)
+    except JobLost:
+        logger.info("Match job %s was reclaimed by another worker", job_id)
+    except Exception as e:
+        logger.exception("Match job %s failed", job_id)
+        try:
+            with _connect() as conn:
+                _update_owned(conn, job, """
+                    UPDATE match_jobs
+                    SET status = 'failed', error = ?, finished_at = datetime('now')
+                    WHERE job_id = ?""", (str(e),))
+        except JobLost:
+            pass
+    else:
+        # The job is already done here, so a failure only loses notifications
+        try:
+            _queue_new_matches(new_pairs_path)
+        except Exception:
+            logger.exception("Queueing notifications for match job %s failed", job_id)
+    finally:
+        for path in (tmp_path, new_pairs_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _worker_loop(worker_id, stop_event):
+    failures = 0
+    while not stop_event.is_set():
+        try:
+            job = claim_next_job(worker_id)
+            if job is not None:
+                run_match_job(job)
+            failures = 0
+        except Exception:
+            # Keep the worker alive (e.g. the DB was locked for longer than the timeout)
+            failures += 1
+            logger.exception("Match worker %s failed", worker_id)
+            stop_event.wait(min(POLL_INTERVAL_SECONDS * 2 ** failures, WORKER_BACKOFF_MAX_SECONDS))
+            continue
+        if job is None:
+            stop_event.wait(POLL_INTERVAL_SECONDS)
+
+
+def start_match_workers(num_workers=2):
+    """
+    Start background worker threads that claim and run match jobs.
+
+    Jobs live in the match_jobs table, so anything queued or left running by a worker
+    that died is picked up again after a restart.
+
+    Returns:
+        threading.Event: Set it to stop the workers.
+    """
+    stop_event = threading.Event()
+    prefix = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    for i in range(num_workers):
+        thread = threading.Thread(
+            target=_worker_loop, args=(f"{prefix}-{i}", stop_event), name=f"match-worker-{i}", daemon=True
+        )
+        thread.start()
+    return stop_event
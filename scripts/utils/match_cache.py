@@ -0,0 +1,140 @@
+import threading
+
+from config import DB_PATH
+from utils.change_feed import add_listener
+from utils.db_utils import get_connection
+from utils.match_utils import build_availability_index, custom_match, default_match, load_student_profiles
+from utils.metrics_utils import inc
+from utils.replica import get_read_connection
+
+_lock = threading.Lock()
+_profiles = None
+_tutor_index = None
+_learner_ids = None
+_results = {}
+# Set after a bulk change: the replica is only re-copied later, so the next load reads the disk
+_load_from_disk = False
+
+# Upper bound on cached match lists before the result cache is cleared
+MAX_CACHED_RESULTS = 100000
+
+# Above this many changed students, reload every profile instead of just the changed ones
+MAX_INCREMENTAL_RELOAD = 500
+
+
+def _load():
+    global _profiles, _tutor_index, _learner_ids, _load_from_disk
+    with _lock:
+        inc("study_buddy_cache_requests_total", {"cache": "profiles", "result": "miss" if _profiles is None else "hit"})
+        if _profiles is None:
+            conn = get_connection() if _load_from_disk else get_read_connection()
+            _profiles = load_student_profiles(DB_PATH, conn=conn)
+            _load_from_disk = False
+            _tutor_index = build_availability_index(_profiles, role="tutor")
+            _learner_ids = sorted(sid for sid, p in _profiles.items() if p["role"] == "learner")
+        return _profiles, _tutor_index, _learner_ids
+
+
+def get_cached_profiles():
+    """
+    Student profiles loaded once per process (reloaded after invalidate_match_cache).
+    """
+    return _load()[0]
+
+
+def get_learner_ids():
+    """
+    Sorted IDs of all learners, used for cursor pagination.
+    """
+    return _load()[2]
+
+
+def get_cached_matches(student_id, mode="default", preferences=None, k=3):
+    """
+    Return the top k matches for a learner, computing them only on the first request.
+
+    Args:
+        student_id (str): The learner's ID.
+        mode (str): 'default' or 'custom'.
+        preferences (dict): Preferences for custom mode.
+        k (int): Number of matches.
+
+    Returns:
+        List[dict]: Matches as returned by default_match / custom_match.
+    """
+    preferences = preferences or {}
+    pref_key = tuple(sorted(key for key, enabled in preferences.items() if enabled))
+    key = (student_id, mode, pref_key if mode == "custom" else (), k)
+
+    matches = _results.get(key)
+    inc("study_buddy_cache_requests_total", {"cache": "matches", "result": "miss" if matches is None else "hit"})
+    if matches is None:
+        profiles, tutor_index, _ = _load()
+        if mode == "custom":
+            matches = custom_match(student_id, preferences, profiles, tutor_index, k)
+        else:
+            matches = default_match(student_id, profiles, tutor_index, k)
+        if len(_results) >= MAX_CACHED_RESULTS:
+            _results.clear()
+        _results[key] = matches
+    return matches
+
+
+def invalidate_match_cache(from_disk=False):
+    """
+    Drop cached profiles and results, e.g. after a new student registers.
+
+    Args:
+        from_disk (bool): Reload the profiles from the database file instead of the read
+            replica, for changes the replica has not caught up with yet.
+    """
+    global _profiles, _tutor_index, _learner_ids, _load_from_disk
+    with _lock:
+        _load_from_disk = _load_from_disk or from_disk
+        _profiles = None
+        _tutor_index = None
+        _learner_ids = None
+        _results.clear()
+
+
+def _apply_changes(changes):
+    """
+    Change-feed listener: reload only the changed students' profiles.
+
+    A learner's matches depend on their own profile and on the tutors, so a change to learners
+    only drops those learners' cached results; a change involving a tutor drops them all, and
+    a bulk change (student ID None) drops the whole cache, which is then reloaded from disk
+    because the replica only re-copies bulk changes in the background.
+    """
+    global _tutor_index, _learner_ids
+    student_ids = changes.get("student", set())
+    if not student_ids:
+        return
+    if None in student_ids or len(student_ids) > MAX_INCREMENTAL_RELOAD:
+        invalidate_match_cache(from_disk=True)
+        return
+
+    with _lock:
+        if _profiles is None:
+            return
+        # Read from disk, not the replica, which may not have caught up yet
+        with get_connection() as conn:
+            reloaded = load_student_profiles(DB_PATH, conn=conn, student_ids=student_ids)
+        tutor_changed = False
+        for sid in student_ids:
+            old, new = _profiles.pop(sid, None), reloaded.get(sid)
+            if new is not None:
+                _profiles[sid] = new
+            tutor_changed = tutor_changed or any(p is not None and p["role"] == "tutor" for p in (old, new))
+
+        if tutor_changed:
+            _tutor_index = build_availability_index(_profiles, role="tutor")
+            _results.clear()
+        else:
+            for key in [key for key in _results if key[0] in student_ids]:
+                del _results[key]
+        _learner_ids = sorted(sid for sid, p in _profiles.items() if p["role"] == "learner")
+    inc("study_buddy_cache_requests_total", {"cache": "profiles", "result": "incremental_reload"})
+
+
+add_listener(_apply_changes)
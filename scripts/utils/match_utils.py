@@ -0,0 +1,375 @@
+import heapq
+from collections import defaultdict
+
+from config import DB_PATH
+from utils.db_utils import get_connection
+from utils.metrics_utils import stage_timer
+from utils.time_utils import WEEKDAY_MAP, time_to_minutes, window_overlap_minutes
+
+# popcount for every 7-bit day mask, so shared-day counts are a table lookup
+DAY_MASK_POPCOUNT = [bin(mask).count("1") for mask in range(128)]
+
+
+def load_student_profiles(db_path=DB_PATH, conn=None, student_ids=None):
+    """
+    Build a profile for each student with their subjects, availability, and study style.
+
+    Produces the same structure as the profile cell in the matching logic notebook,
+    but reads each table once instead of filtering DataFrames per student.
+
+    Args:
+        db_path (str): Path to the SQLite database.
+        conn: Optional open connection to read from instead (e.g. the in-memory replica).
+        student_ids (list): Only load these students (all students if None).
+
+    Returns:
+        dict: Profiles keyed by student_id.
+    """
+    student_profiles = {}
+    where, params = "", ()
+    if student_ids is not None:
+        student_ids = list(student_ids)
+        where = f"WHERE student_id IN ({', '.join('?' for _ in student_ids)})"
+        params = student_ids
+    with stage_timer("load_profiles"):
+        with conn or get_connection(db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT student_id, study_style, personality_type, GPA, utc_start_time, utc_end_time
+                FROM students {where}
+            """, params)
+            for sid, style, personality, gpa, start_time, end_time in cursor.fetchall():
+                student_profiles[sid] = {
+                    "subjects": set(),
+                    "days": set(),
+                    "style": style,
+                    "personality": personality,
+                    "GPA": gpa,
+                    "start_time": start_time,
+                    "end_time": end_time,
+                    # Assign role based on GPA
+                    "role": "tutor" if gpa is not None and gpa >= 3.5 else "learner"
+                }
+
+            cursor.execute(f"""
+                SELECT student_subjects.student_id, subjects.subject_name
+                FROM student_subjects
+                JOIN subjects ON subjects.subject_id = student_subjects.subject_id
+                {where.replace("student_id", "student_subjects.student_id")}
+            """, params)
+            for sid, subject_name in cursor.fetchall():
+                if sid in student_profiles:
+                    student_profiles[sid]["subjects"].add(subject_name)
+
+            cursor.execute(f"SELECT student_id, utc_day FROM utc_study_days {where}", params)
+            for sid, utc_day in cursor.fetchall():
+                if sid in student_profiles:
+                    student_profiles[sid]["days"].add(utc_day)
+
+    return student_profiles
+
+
+def encode_day_mask(days):
+    """
+    Encode a collection of weekday abbreviations as a 7-bit mask (Mon = bit 0).
+
+    Args:
+        days (iterable): Weekday abbreviations such as {'Mon', 'Wed'}.
+
+    Returns:
+        int: Bit mask in the range 0-127.
+    """
+    mask = 0
+    for day in days:
+        mask |= 1 << WEEKDAY_MAP[day]
+    return mask
+
+
+def build_availability_index(student_profiles, role="tutor"):
+    """
+    Bucket students by UTC day mask and UTC study window.
+
+    Students with the same day mask and the same start/end time land in the same
+    bucket, so a query only has to look at (at most) 128 masks times the handful
+    of distinct study windows instead of every student.
+
+    Args:
+        student_profiles (dict): Profiles keyed by student_id, as built by the matching logic.
+        role (str or None): Only index students with this role. Pass None to index everyone.
+
+    Returns:
+        dict: {day_mask: {(start_minute, end_minute): [student_id, ...]}}
+    """
+    index = defaultdict(lambda: defaultdict(list))
+    for sid, profile in student_profiles.items():
+        if role is not None and profile["role"] != role:
+            continue
+        window = (time_to_minutes(profile["start_time"]), time_to_minutes(profile["end_time"]))
+        index[encode_day_mask(profile["days"])][window].append(sid)
+    return index
+
+
+def iter_candidate_ids(index, profile, min_common_days=2, min_overlap_minutes=0):
+    """
+    Yield the indexed students that pass the availability criteria for a profile, bucket by
+    bucket, so callers that only need a few candidates can stop early.
+
+    Time overlap is measured the same way as get_time_overlap_minutes (modulo 24 hours, so
+    windows past midnight such as 23:00-03:00 count), so pruning here never drops a
+    candidate that scoring would have accepted.
+
+    Args:
+        index (dict): Output of build_availability_index.
+        profile (dict): Profile of the student being matched.
+        min_common_days (int): Minimum number of shared UTC days (default is 2).
+        min_overlap_minutes (int): Minimum time overlap in minutes. Use 0 to skip the time check.
+
+    Yields:
+        str: Candidate student IDs.
+    """
+    user_mask = encode_day_mask(profile["days"])
+    user_start = time_to_minutes(profile["start_time"])
+    user_end = time_to_minutes(profile["end_time"])
+
+    # The same study window appears under many day masks; check each one only once
+    window_ok = {}
+    for mask, windows in index.items():
+        if DAY_MASK_POPCOUNT[mask & user_mask] < min_common_days:
+            continue
+        for window, student_ids in windows.items():
+            if min_overlap_minutes:
+                ok = window_ok.get(window)
+                if ok is None:
+                    ok = window_ok[window] = window_overlap_minutes(user_start, user_end, *window) >= min_overlap_minutes
+                if not ok:
+                    continue
+            yield from student_ids
+
+
+def get_candidate_ids(index, profile, min_common_days=2, min_overlap_minutes=0):
+    """
+    Return the indexed students that pass the availability criteria for a profile
+    (see iter_candidate_ids).
+
+    Returns:
+        list: Candidate student IDs.
+    """
+    return list(iter_candidate_ids(index, profile, min_common_days, min_overlap_minutes))
+
+
+MATCH_COLUMNS = [
+    "student_id",
+    "match_id",
+    "subject_overlap",
+    "day_overlap",
+    "time_overlap_minutes",
+    "style_match",
+    "goal_match",
+    "personality_match",
+    "total_score",
+]
+
+
+def get_time_overlap_minutes(start1, end1, start2, end2):
+    """
+    Minutes of overlap between two HH:MM UTC time ranges (0 if they do not overlap).
+
+    Ranges ending at or before their start run past midnight (e.g. Late Nights 22:00-02:00).
+    """
+    return window_overlap_minutes(
+        time_to_minutes(start1), time_to_minutes(end1), time_to_minutes(start2), time_to_minutes(end2)
+    )
+
+
+def default_match(student_id, student_profiles, tutor_index=None, k=3):
+    """
+    Returns the top k tutor matches for a learner using the default matching criteria.
+
+    Only tutors sharing at least 2 UTC days and 60+ minutes of UTC time with the learner
+    are scored. The score is the number of shared subjects + shared days + 1 for a matching
+    study style + 1 for the time overlap.
+
+    Args:
+        student_id (str): The learner's ID.
+        student_profiles (dict): Profiles keyed by student_id (see load_student_profiles).
+        tutor_index (dict): Optional prebuilt tutor availability index, reused across calls.
+        k (int): Number of matches to return.
+
+    Returns:
+        List[dict]: Up to k matches with the keys in MATCH_COLUMNS.
+    """
+    profile = student_profiles.get(student_id)
+    if profile is None or profile["role"] != "learner":
+        return []
+    if tutor_index is None:
+        tutor_index = build_availability_index(student_profiles, role="tutor")
+
+    with stage_timer("candidates"):
+        candidate_ids = get_candidate_ids(tutor_index, profile, min_common_days=2, min_overlap_minutes=60)
+
+    results = []
+    with stage_timer("scoring"):
+        for partner_id in candidate_ids:
+            if partner_id == student_id:
+                continue
+            partner = student_profiles[partner_id]
+            subject_match = len(profile["subjects"] & partner["subjects"])
+            day_match = len(profile["days"] & partner["days"])
+            style_match = profile["style"] == partner["style"]
+            time_overlap = get_time_overlap_minutes(
+                profile["start_time"], profile["end_time"], partner["start_time"], partner["end_time"]
+            )
+            results.append({
+                "student_id": student_id,
+                "match_id": partner_id,
+                "subject_overlap": subject_match,
+                "day_overlap": day_match,
+                "time_overlap_minutes": time_overlap,
+                "style_match": style_match,
+                "goal_match": False,
+                "personality_match": False,
+                "total_score": subject_match + day_match + int(style_match) + 1
+            })
+
+    with stage_timer("top_k"):
+        return heapq.nlargest(k, results, key=lambda x: x["total_score"])
+
+
+def custom_match(student_id, preferences, student_profiles, tutor_index=None, k=3):
+    """
+    Returns the top k tutor matches for a learner based on selected matching preferences.
+
+    Same scoring as custom_match in the matching logic notebook. Ties are broken by
+    match_id, so the ranking does not depend on the order of student_profiles.
+
+    When 'days' is selected, tutors sharing 2+ UTC days are scored first using the tutor
+    availability index. Every other tutor can score at most the learner's subject count plus
+    the style, GPA and personality points, so the index result is used only if its k-th score
+    is above that bound; otherwise every tutor is scored. Either way the result is the same
+    as scoring every tutor.
+
+    Args:
+        student_id (str): The learner's ID.
+        preferences (dict): Booleans for 'subjects', 'days', 'time', 'style', 'GPA', 'personality'.
+        student_profiles (dict): Profiles keyed by student_id (see load_student_profiles).
+        tutor_index (dict): Optional prebuilt tutor availability index, reused across calls.
+        k (int): Number of matches to return.
+
+    Returns:
+        List[dict]: Up to k matches with the keys in MATCH_COLUMNS.
+    """
+    profile = student_profiles.get(student_id)
+    if profile is None or profile["role"] != "learner":
+        return []
+
+    if preferences.get("days"):
+        if tutor_index is None:
+            tutor_index = build_availability_index(student_profiles, role="tutor")
+        with stage_timer("candidates"):
+            candidate_ids = get_candidate_ids(tutor_index, profile, min_common_days=2)
+        matches = _top_custom_matches(student_id, profile, preferences, student_profiles, candidate_ids, k)
+
+        # Upper bound for the tutors left out: no day or time points
+        bound = sum(bool(preferences.get(key)) for key in ("style", "GPA", "personality"))
+        if preferences.get("subjects"):
+            bound += len(profile["subjects"])
+        if len(matches) == k and matches[-1]["total_score"] > bound:
+            return matches
+
+    return _top_custom_matches(student_id, profile, preferences, student_profiles, student_profiles, k)
+
+
+def _top_custom_matches(student_id, profile, preferences, student_profiles, candidate_ids, k):
+    """
+    Score candidate tutors for custom_match and keep the top k (highest score, then lowest match_id).
+    """
+    results = []
+    with stage_timer("scoring"):
+        for partner_id in candidate_ids:
+            partner = student_profiles[partner_id]
+            if partner_id == student_id or partner["role"] != "tutor":
+                continue
+
+            score = 0
+            subject_overlap = 0
+            day_overlap = 0
+            time_overlap = None
+
+            if preferences.get("subjects"):
+                subject_overlap = len(profile["subjects"] & partner["subjects"])
+                score += subject_overlap
+
+            if preferences.get("days"):
+                day_overlap = len(profile["days"] & partner["days"])
+                if day_overlap >= 2:  # Require at least 2 common days
+                    score += 1
+                    if preferences.get("time"):
+                        time_overlap = get_time_overlap_minutes(
+                            profile["start_time"], profile["end_time"],
+                            partner["start_time"], partner["end_time"]
+                        )
+                        if time_overlap >= 60:
+                            score += 1
+
+            style_match = bool(preferences.get("style")) and profile["style"] == partner["style"]
+            goal_match = bool(preferences.get("GPA")) and profile["GPA"] == partner["GPA"]
+            personality_match = bool(preferences.get("personality")) and profile["personality"] == partner["personality"]
+            score += int(style_match) + int(goal_match) + int(personality_match)
+
+            results.append({
+                "student_id": student_id,
+                "match_id": partner_id,
+                "subject_overlap": subject_overlap,
+                "day_overlap": day_overlap,
+                "time_overlap_minutes": time_overlap,
+                "style_match": style_match,
+                "goal_match": goal_match,
+                "personality_match": personality_match,
+                "total_score": score
+            })
+
+    with stage_timer("top_k"):
+        return heapq.nsmallest(k, results, key=lambda x: (-x["total_score"], x["match_id"]))
+
+
+def iter_matches(student_profiles, mode="default", preferences=None, k=3, learner_ids=None, chunk_size=1024,
+                 tutor_index=None, tutor_vectors=None):
+    """
+    Yield match rows learner by learner instead of collecting them in one list.
+
+    Args:
+        student_profiles (dict): Profiles keyed by student_id (see load_student_profiles).
+        mode (str): 'default', 'custom' or 'similarity'.
+        preferences (dict): Preferences for custom mode.
+        k (int): Number of matches per learner.
+        learner_ids (iterable): Optional subset of learners (defaults to every learner).
+        chunk_size (int): Learners per block in similarity mode.
+        tutor_index (dict): Optional prebuilt tutor availability index, reused across calls.
+        tutor_vectors (dict): Optional prebuilt tutor vectors for similarity mode (see
+            similarity_utils.build_tutor_vectors), reused across calls.
+
+    Yields:
+        dict: One match row with the keys in MATCH_COLUMNS.
+    """
+    if learner_ids is None:
+        learner_ids = [sid for sid, p in student_profiles.items() if p["role"] == "learner"]
+
+    if mode == "similarity":
+        # Imported here because similarity_utils builds on this module
+        from utils.similarity_utils import iter_similarity_matches
+
+        yield from iter_similarity_matches(
+            student_profiles, k=k, block_size=chunk_size, learner_ids=learner_ids, tutor_vectors=tutor_vectors
+        )
+        return
+
+    if mode not in ("default", "custom"):
+        raise ValueError(f"Unknown match mode: {mode}")
+
+    if tutor_index is None:
+        tutor_index = build_availability_index(student_profiles, role="tutor")
+    for student_id in learner_ids:
+        if mode == "default":
+            yield from default_match(student_id, student_profiles, tutor_index, k)
+        else:
+            yield from custom_match(student_id, preferences or {}, student_profiles, tutor_index, k)
@@ -0,0 +1,130 @@
+import threading
+
+from utils.db_utils import get_connection
+from utils.notification_utils import queue_notifications
+
+MAX_MESSAGE_LENGTH = 2000
+
+_channel = threading.Condition()
+_latest = {}            # conversation_id -> newest message_id published in this process
+
+
+def conversation_id(student_a, student_b):
+    """
+    Key shared by both directions of a chat (the two student IDs in sorted order).
+    """
+    return ":".join(sorted((student_a, student_b)))
+
+
+def _row_to_message(row):
+    return {
+        "message_id": row[0],
+        "sender_id": row[1],
+        "receiver_id": row[2],
+        "content": row[3],
+        "timestamp": row[4],
+    }
+
+
+def send_message(sender_id, receiver_id, content):
+    """
+    Store a message, queue a notification for the receiver and wake anyone waiting on the chat.
+
+    Args:
+        sender_id (str): Student sending the message.
+        receiver_id (str): Student receiving it.
+        content (str): Message text.
+
+    Returns:
+        dict: The stored message.
+    """
+    conv = conversation_id(sender_id, receiver_id)
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO messages (conversation_id, sender_id, receiver_id, content) VALUES (?, ?, ?, ?)",
+            (conv, sender_id, receiver_id, content)
+        )
+        message_id = cursor.lastrowid
+        queue_notifications(cursor, [(receiver_id, "new_message", f"New message from {sender_id}")])
+        cursor.execute(
+            "SELECT message_id, sender_id, receiver_id, content, timestamp FROM messages WHERE message_id = ?",
+            (message_id,)
+        )
+        message = _row_to_message(cursor.fetchone())
+
+    with _channel:
+        _latest[conv] = max(_latest.get(conv, 0), message_id)
+        _channel.notify_all()
+    return message
+
+
+def get_messages(conv, before=None, limit=50):
+    """
+    One page of a conversation, newest first.
+
+    Uses keyset pagination on (conversation_id, message_id), so every page is a short range
+    scan of idx_messages_conversation no matter how long the history is.
+
+    Args:
+        conv (str): Conversation ID.
+        before (int): Return messages older than this message_id (the previous page's cursor).
+        limit (int): Page size.
+
+    Returns:
+        Tuple[List[dict], int]: The messages and the cursor for the next (older) page, or None.
+    """
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT message_id, sender_id, receiver_id, content, timestamp
+            FROM messages
+            WHERE conversation_id = ? AND message_id < ?
+            ORDER BY message_id DESC
+            LIMIT ?
+        """, (conv, before if before is not None else 2 ** 63 - 1, limit + 1)).fetchall()
+
+    messages = [_row_to_message(row) for row in rows[:limit]]
+    next_cursor = messages[-1]["message_id"] if len(rows) > limit else None
+    return messages, next_cursor
+
+
+def get_messages_after(conv, after_id, limit=100):
+    """
+    Messages newer than `after_id`, oldest first.
+    """
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT message_id, sender_id, receiver_id, content, timestamp
+            FROM messages
+            WHERE conversation_id = ? AND message_id > ?
+            ORDER BY message_id
+            LIMIT ?
+        """, (conv, after_id, limit)).fetchall()
+    return [_row_to_message(row) for row in rows]
+
+
+def get_latest_message_id(conv):
+    """
+    Newest message_id in a conversation (0 if it has none); a single index lookup.
+    """
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT MAX(message_id) FROM messages WHERE conversation_id = ?", (conv,)
+        ).fetchone()
+    return row[0] or 0
+
+
+def wait_for_messages(conv, after_id, timeout=25):
+    """
+    Block until a message newer than `after_id` is sent in this process, or until `timeout`.
+
+    Waiters sleep on an in-process condition and only query the database once they are woken
+    (or time out, which also picks up messages written by other processes), so open streams
+    do not poll SQLite in a loop.
+
+    Returns:
+        List[dict]: New messages, oldest first (empty on timeout with nothing new).
+    """
+    with _channel:
+        _channel.wait_for(lambda: _latest.get(conv, 0) > after_id, timeout=timeout)
+    return get_messages_after(conv, after_id)
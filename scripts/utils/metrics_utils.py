@@ -0,0 +1,223 @@
+import contextvars
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds (seconds, or counts for query histograms)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = defaultdict(float)
+_help = {}
+
+# SQL stats for the request (or job) currently running in this context
+_sql_stats = contextvars.ContextVar("sql_stats", default=None)
+
+
+def _key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def describe(name, text):
+    """
+    Set the # HELP text of a metric.
+    """
+    _help[name] = text
+
+
+def observe(name, value, labels=None, buckets=DEFAULT_BUCKETS):
+    """
+    Record one observation in a histogram.
+    """
+    with _lock:
+        hist = _histograms.get((name, _key(labels)))
+        if hist is None:
+            hist = _histograms[(name, _key(labels))] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(hist["buckets"]):
+            if value <= bound:
+                hist["counts"][i] += 1
+        hist["sum"] += value
+        hist["count"] += 1
+
+
+def inc(name, labels=None, amount=1):
+    """
+    Increase a counter.
+    """
+    with _lock:
+        _counters[(name, _key(labels))] += amount
+
+
+@contextmanager
+def stage_timer(stage):
+    """
+    Time a block of code as a matching stage (study_buddy_match_stage_seconds{stage=...}).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("study_buddy_match_stage_seconds", time.perf_counter() - start, {"stage": stage})
+
+
+def get_stage_totals():
+    """
+    Total seconds and number of calls per matching stage recorded by stage_timer.
+
+    Returns:
+        dict: {stage: (seconds, calls)}
+    """
+    with _lock:
+        return {
+            dict(labels)["stage"]: (hist["sum"], hist["count"])
+            for (name, labels), hist in _histograms.items()
+            if name == "study_buddy_match_stage_seconds"
+        }
+
+
+def start_sql_tracking():
+    """
+    Start counting SQL statements run through InstrumentedConnection in this context.
+
+    Returns:
+        dict: Live stats ({'queries': int, 'seconds': float}), also returned by get_sql_stats.
+    """
+    stats = {"queries": 0, "seconds": 0.0}
+    _sql_stats.set(stats)
+    return stats
+
+
+def get_sql_stats():
+    return _sql_stats.get()
+
+
+def _record_sql(elapsed):
+    stats = _sql_stats.get()
+    if stats is not None:
+        stats["queries"] += 1
+        stats["seconds"] += elapsed
+    observe("study_buddy_sql_query_seconds", elapsed)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Cursor that times every execute/executemany call.
+    """
+
+    def execute(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().execute(*args, **kwargs)
+        finally:
+            _record_sql(time.perf_counter() - start)
+
+    def executemany(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().executemany(*args, **kwargs)
+        finally:
+            _record_sql(time.perf_counter() - start)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Connection whose cursors (including conn.execute shortcuts) are InstrumentedCursors.
+
+    Use as sqlite3.connect(path, factory=InstrumentedConnection).
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args, **kwargs):
+        return self.cursor().execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return self.cursor().executemany(*args, **kwargs)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+def render_prometheus():
+    """
+    Render all metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    with _lock:
+        seen = set()
+        for (name, labels), hist in sorted(_histograms.items()):
+            if name not in seen:
+                seen.add(name)
+                if name in _help:
+                    lines.append(f"# HELP {name} {_help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+            for bound, count in zip(hist["buckets"], hist["counts"]):
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {hist['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {hist['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {hist['count']}")
+
+        for (name, labels), value in sorted(_counters.items()):
+            if name not in seen:
+                seen.add(name)
+                if name in _help:
+                    lines.append(f"# HELP {name} {_help[name]}")
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """
+    Minimal sampling profiler for one thread.
+
+    A background thread records the target thread's call stack every `interval` seconds.
+    Stacks are kept in the collapsed "outer;inner count" format used by flame graph tools.
+    """
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+
+describe("study_buddy_request_duration_seconds", "Flask request latency by endpoint.")
+describe("study_buddy_request_sql_queries", "SQL statements executed per request.")
+describe("study_buddy_request_sql_seconds", "Time spent in SQL per request.")
+describe("study_buddy_sql_query_seconds", "Latency of individual SQL statements.")
+describe("study_buddy_match_stage_seconds", "Time spent in each matching stage.")
+describe("study_buddy_cache_requests_total", "Cache lookups by cache and result (hit/miss).")
@@ -0,0 +1,220 @@
+import importlib
+import inspect
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from config import DB_PATH
+from utils.db_utils import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Notification types that are merged into one digest per student per dispatch
+COALESCED_TYPES = {"new_match"}
+
+DISPATCH_CHUNK_SIZE = 500
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+
+# A claimed notification is hidden from other dispatchers for this long; if its dispatcher dies
+# before recording the result, it becomes due again afterwards
+CLAIM_LEASE_SECONDS = 300
+
+
+def queue_notifications(cursor, notifications):
+    """
+    Add notifications to the outbox in one batched insert.
+
+    Call it with the cursor of the triggering action so the notifications are committed (or
+    rolled back) together with it. Nothing is delivered here; the dispatcher does that later.
+
+    Args:
+        cursor: SQLite cursor object.
+        notifications (iterable): (student_id, type, content) tuples.
+
+    Returns:
+        int: Number of notifications queued.
+    """
+    rows = list(notifications)
+    cursor.executemany(
+        "INSERT INTO notifications (student_id, type, content, status) VALUES (?, ?, ?, 'pending')",
+        rows
+    )
+    return len(rows)
+
+
+def queue_match_notifications(cursor, matches):
+    """
+    Queue one "new_match" notification per (student_id, match_id) pair.
+
+    The dispatcher merges a student's pending "new_match" rows into a single digest.
+    """
+    return queue_notifications(cursor, (
+        (student_id, "new_match", f"New study match: {match_id}")
+        for student_id, match_id in matches
+    ))
+
+
+class MemorySink:
+    """
+    Local stand-in delivery sink that records deliveries in memory (for tests and development).
+    """
+
+    def __init__(self, fail_for=()):
+        self.delivered = []
+        self.fail_for = set(fail_for)
+
+    def __call__(self, student_id, notification_type, content):
+        if student_id in self.fail_for:
+            raise ConnectionError(f"Delivery to {student_id} failed")
+        self.delivered.append((student_id, notification_type, content))
+
+
+def load_sink(spec):
+    """
+    Load a delivery sink from a "module:callable" string (see NOTIFICATION_SINK in config.py).
+
+    Classes are instantiated with no arguments; any other callable is used as it is.
+    """
+    module_name, _, attribute = spec.partition(":")
+    sink = getattr(importlib.import_module(module_name), attribute)
+    return sink() if inspect.isclass(sink) else sink
+
+
+def _group(rows):
+    """
+    Turn pending rows into deliveries, merging coalesced types into one digest per student.
+
+    Returns:
+        List[tuple]: (student_id, type, content, notification_ids)
+    """
+    deliveries = []
+    digests = defaultdict(list)
+    for notification_id, student_id, notification_type, content, _ in rows:
+        if notification_type in COALESCED_TYPES:
+            digests[(student_id, notification_type)].append((notification_id, content))
+        else:
+            deliveries.append((student_id, notification_type, content, [notification_id]))
+
+    for (student_id, notification_type), items in digests.items():
+        if len(items) == 1:
+            content = items[0][1]
+        else:
+            content = f"You have {len(items)} new updates: " + "; ".join(c for _, c in items[:5])
+            if len(items) > 5:
+                content += f"; and {len(items) - 5} more"
+        deliveries.append((student_id, notification_type, content, [i for i, _ in items]))
+    return deliveries
+
+
+def _claim_due(db_path, chunk_size):
+    """
+    Claim up to chunk_size due notifications for this dispatcher.
+
+    The rows are selected and leased (next_attempt_at pushed CLAIM_LEASE_SECONDS ahead) in one
+    BEGIN IMMEDIATE transaction, so concurrent dispatchers (several workers, or the debug
+    reloader's two processes) never claim the same notification.
+
+    Returns:
+        Tuple[List[tuple], float]: The claimed rows and the lease value that marks them as ours.
+    """
+    conn = get_connection(db_path)
+    try:
+        conn.isolation_level = None
+        conn.execute("BEGIN IMMEDIATE")
+        now = time.time()
+        rows = conn.execute("""
+            SELECT notification_id, student_id, type, content, attempts
+            FROM notifications
+            WHERE status = 'pending' AND next_attempt_at <= ?
+            ORDER BY notification_id
+            LIMIT ?
+        """, (now, chunk_size)).fetchall()
+        lease = now + CLAIM_LEASE_SECONDS
+        conn.executemany(
+            "UPDATE notifications SET next_attempt_at = ? WHERE notification_id = ?",
+            [(lease, row[0]) for row in rows]
+        )
+        conn.execute("COMMIT")
+        return rows, lease
+    finally:
+        conn.close()
+
+
+def dispatch_pending(sink, db_path=DB_PATH, chunk_size=DISPATCH_CHUNK_SIZE):
+    """
+    Deliver due notifications in chunks until none are left.
+
+    Each chunk is claimed first (see _claim_due), so running several dispatchers at once
+    delivers every notification only once. Failed deliveries are retried with exponential
+    backoff (RETRY_BASE_SECONDS doubling up to RETRY_MAX_SECONDS) and marked 'failed' after
+    MAX_ATTEMPTS.
+
+    Args:
+        sink (callable): sink(student_id, type, content) delivers one notification.
+        db_path (str): Path to the SQLite database.
+        chunk_size (int): Notifications claimed per chunk.
+
+    Returns:
+        dict: Counts of 'sent', 'retried' and 'failed' notifications.
+    """
+    counts = {"sent": 0, "retried": 0, "failed": 0}
+    while True:
+        rows, lease = _claim_due(db_path, chunk_size)
+        if not rows:
+            return counts
+        attempts = {row[0]: row[4] for row in rows}
+
+        sent, retry, failed = [], [], []
+        for student_id, notification_type, content, ids in _group(rows):
+            try:
+                sink(student_id, notification_type, content)
+                sent.extend((i, lease) for i in ids)
+            except Exception:
+                for notification_id in ids:
+                    tries = attempts[notification_id] + 1
+                    if tries >= MAX_ATTEMPTS:
+                        failed.append((tries, notification_id, lease))
+                    else:
+                        delay = min(RETRY_BASE_SECONDS * 2 ** (tries - 1), RETRY_MAX_SECONDS)
+                        retry.append((tries, time.time() + delay, notification_id, lease))
+
+        # Only rows still holding our lease are updated
+        with get_connection(db_path) as conn:
+            conn.executemany("""
+                UPDATE notifications SET status = 'sent', delivered_at = datetime('now')
+                WHERE notification_id = ? AND next_attempt_at = ?
+            """, sent)
+            conn.executemany("""
+                UPDATE notifications SET attempts = ?, next_attempt_at = ?
+                WHERE notification_id = ? AND next_attempt_at = ?
+            """, retry)
+            conn.executemany("""
+                UPDATE notifications SET status = 'failed', attempts = ?
+                WHERE notification_id = ? AND next_attempt_at = ?
+            """, failed)
+        counts["sent"] += len(sent)
+        counts["retried"] += len(retry)
+        counts["failed"] += len(failed)
+
+
+def start_notification_dispatcher(sink, interval):
+    """
+    Drain the outbox every `interval` seconds on a background thread.
+
+    Returns:
+        threading.Event: Set it to stop the dispatcher.
+    """
+    stop_event = threading.Event()
+
+    def run():
+        while not stop_event.wait(interval):
+            try:
+                dispatch_pending(sink)
+            except Exception:
+                logger.exception("Notification dispatch failed")
+
+    threading.Thread(target=run, name="notification-dispatcher", daemon=True).start()
+    return stop_event
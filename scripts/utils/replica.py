@@ -0,0 +1,220 @@
+import itertools
+import logging
+import sqlite3
+import threading
+
+from config import DB_PATH, USE_READ_REPLICA, REPLICA_MAX_STALENESS_SECONDS
+from utils.change_feed import add_listener
+from utils.db_utils import get_connection
+from utils.metrics_utils import InstrumentedConnection, describe, inc
+
+logger = logging.getLogger(__name__)
+
+# Tables whose rows belong to one student; changes to those students are copied row by row
+STUDENT_TABLES = ("students", "study_days", "utc_study_days", "student_subjects", "users")
+
+_lock = threading.Lock()          # guards swapping the replica; never held during a copy
+_copy_lock = threading.Lock()     # one full copy at a time
+_rows_lock = threading.Lock()     # one row update of the replica at a time; never held during a copy
+_refresh_needed = threading.Event()
+_pending = None           # rows changed while a copy is being made, re-applied to it before the swap
+_generation = itertools.count(1)
+_replica_uri = None
+_keeper = None            # keeps the current in-memory database alive
+_disk_conn = None         # long-lived connection used only for PRAGMA data_version (under _copy_lock)
+_data_version = None
+
+describe("study_buddy_replica_refreshes_total", "Copies of the database loaded into the in-memory replica.")
+describe("study_buddy_replica_row_updates_total", "Change-feed batches applied to the replica row by row.")
+
+
+def _replica_name(generation):
+    # memdb databases whose name starts with "/" are shared by every connection in the process
+    # and use normal file locking, so readers see whole transactions and wait (busy timeout)
+    # instead of failing the way shared-cache table locks do
+    return f"file:/study_buddy_replica_{generation}?vfs=memdb"
+
+
+def _copy_from_disk():
+    """
+    Copy the on-disk database into a new shared in-memory database.
+
+    Returns:
+        Tuple[str, sqlite3.Connection]: The new database's URI and the connection keeping it alive.
+    """
+    uri = _replica_name(next(_generation))
+    keeper = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    source = sqlite3.connect(DB_PATH)
+    try:
+        source.backup(keeper)
+    finally:
+        source.close()
+    return uri, keeper
+
+
+def _swap(uri, keeper):
+    """
+    Point new readers at a fresh copy and free the previous one.
+
+    Connections already open on the previous copy keep it alive until they close.
+    """
+    global _replica_uri, _keeper
+    with _lock:
+        old_keeper = _keeper
+        _replica_uri, _keeper = uri, keeper
+        if old_keeper is not None:
+            old_keeper.close()
+    inc("study_buddy_replica_refreshes_total")
+
+
+def refresh_replica():
+    """
+    Re-copy the database if it changed on disk.
+
+    PRAGMA data_version changes whenever another connection commits, so the check itself is a
+    single cheap query. The copy is built outside _lock and _rows_lock and only swapped in
+    under them, so readers and row updates (see _apply_rows) never wait for it. Rows changed
+    while copying are written to the new copy as well before it replaces the old one, and
+    data_version is read before copying, so any other commit that lands during the copy
+    triggers another refresh.
+    """
+    global _data_version, _pending
+    if _disk_conn is None:
+        return
+    with _copy_lock:
+        data_version = _disk_conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == _data_version:
+            return
+        with _rows_lock:
+            _pending = {"student_ids": set(), "subjects": False}
+        try:
+            uri, keeper = _copy_from_disk()
+        finally:
+            with _rows_lock:
+                pending, _pending = _pending, None
+        with _rows_lock:
+            _write_rows(keeper, pending["student_ids"], pending["subjects"])
+            _data_version = data_version
+            _swap(uri, keeper)
+
+
+def _refresh_loop():
+    while True:
+        # Full copies block disk writers while they run (rollback journal), so they are rare;
+        # woken early when the change feed reports a bulk change
+        _refresh_needed.wait(REPLICA_MAX_STALENESS_SECONDS)
+        _refresh_needed.clear()
+        try:
+            refresh_replica()
+        except Exception:
+            logger.exception("Refreshing the read replica failed")
+
+
+def load_replica():
+    """
+    Load study_buddy.db into memory (backup API) so read-heavy routes stop touching the disk.
+
+    Later refreshes run on a background thread, so no request ever waits for a copy.
+    """
+    global _disk_conn
+    with _copy_lock:
+        if _disk_conn is not None:
+            return
+        _disk_conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    refresh_replica()
+    threading.Thread(target=_refresh_loop, name="replica-refresh", daemon=True).start()
+
+
+def _write_rows(keeper, student_ids, subjects_changed):
+    """
+    Copy the current disk rows of the given students (and the subjects table) into a replica.
+    """
+    if not student_ids and not subjects_changed:
+        return
+    student_ids = sorted(student_ids)
+    placeholders = ", ".join("?" for _ in student_ids)
+    source = sqlite3.connect(DB_PATH)
+    try:
+        subjects = source.execute("SELECT * FROM subjects").fetchall() if subjects_changed else []
+        rows = {}
+        if student_ids:
+            for table in STUDENT_TABLES:
+                rows[table] = source.execute(
+                    f"SELECT * FROM {table} WHERE student_id IN ({placeholders})", student_ids
+                ).fetchall()
+    finally:
+        source.close()
+
+    with keeper:
+        if subjects:
+            columns = ", ".join("?" for _ in subjects[0])
+            keeper.executemany(f"INSERT OR REPLACE INTO subjects VALUES ({columns})", subjects)
+        for table, table_rows in rows.items():
+            # students and users are replaced in place so their rows never disappear mid-update
+            if table not in ("students", "users"):
+                keeper.execute(f"DELETE FROM {table} WHERE student_id IN ({placeholders})", student_ids)
+            if table_rows:
+                columns = ", ".join("?" for _ in table_rows[0])
+                keeper.executemany(f"INSERT OR REPLACE INTO {table} VALUES ({columns})", table_rows)
+        present = {row[0] for row in rows.get("students", ())}
+        removed = [sid for sid in student_ids if sid not in present]
+        if removed:
+            keeper.execute(f"DELETE FROM students WHERE student_id IN ({', '.join('?' for _ in removed)})", removed)
+
+
+def _apply_rows(student_ids, subjects_changed):
+    """
+    Copy the changed students' rows (and subjects) from disk into the current replica.
+
+    Only these rows are read and written, so the cost depends on the size of the change, not of
+    the database, and it never waits for a full copy. The write is one short transaction;
+    readers wait for it to commit, so they never see a student half updated. If it cannot get
+    the lock in time, a full copy is requested instead.
+    """
+    with _rows_lock:
+        if _keeper is None:
+            return
+        if _pending is not None:
+            _pending["student_ids"].update(student_ids)
+            _pending["subjects"] = _pending["subjects"] or subjects_changed
+        try:
+            _write_rows(_keeper, student_ids, subjects_changed)
+        except sqlite3.OperationalError:
+            logger.exception("Updating replica rows failed; scheduling a full copy")
+            _refresh_needed.set()
+            return
+    inc("study_buddy_replica_row_updates_total")
+
+
+def _apply_changes(changes):
+    """
+    Change-feed listener: copy the changed students' rows into the replica right away.
+
+    Bulk changes (a student ID of None) wake the background thread for a full copy instead,
+    so the registration writer that runs this listener never waits on one.
+    """
+    student_ids = changes.get("student", set())
+    if None in student_ids:
+        _refresh_needed.set()
+        return
+    _apply_rows(student_ids, "subject" in changes)
+
+
+add_listener(_apply_changes)
+
+
+def get_read_connection():
+    """
+    Open a read-only connection to the in-memory replica, or to the disk if the replica is off.
+
+    Student and subject rows (STUDENT_TABLES, subjects) are updated from the change feed as
+    soon as it is polled; other tables can lag by up to REPLICA_MAX_STALENESS_SECONDS. Writes
+    (and reads of other tables that must see a write just made) should go through get_connection.
+    """
+    if not USE_READ_REPLICA or _replica_uri is None:
+        return get_connection()
+    # Opening under _lock keeps the copy from being freed between reading the URI and connecting
+    with _lock:
+        conn = sqlite3.connect(_replica_uri, uri=True, factory=InstrumentedConnection)
+    conn.execute("PRAGMA query_only = 1")
+    return conn
@@ -0,0 +1,283 @@
+from collections import defaultdict
+
+from config import DB_PATH
+from utils.db_utils import get_connection
+from utils.notification_utils import queue_notifications
+from utils.time_utils import WEEKDAY_MAP, REVERSE_WEEKDAY_MAP, time_to_minutes
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Sessions may not be longer than this, which bounds the index range scanned for conflicts
+MAX_SESSION_MINUTES = MINUTES_PER_DAY
+
+
+class SessionConflict(Exception):
+    """
+    Raised when a new session overlaps a session the host or guest already has.
+    """
+
+    def __init__(self, session_ids):
+        super().__init__(f"Overlaps scheduled session(s) {', '.join(map(str, session_ids))}")
+        self.session_ids = session_ids
+
+
+def to_week_interval(day, start_time, end_time):
+    """
+    Convert a UTC day and HH:MM times to a minute-of-week interval (Mon 00:00 = 0).
+
+    Times ending at or before they start run past midnight, so end_minute may go past the end
+    of the week (e.g. Sun 22:00-02:00); start_minute is always within it.
+
+    Returns:
+        Tuple[int, int]: (start_minute, end_minute)
+    """
+    start = WEEKDAY_MAP[day] * MINUTES_PER_DAY + time_to_minutes(start_time)
+    length = (time_to_minutes(end_time) - time_to_minutes(start_time)) % MINUTES_PER_DAY
+    return start, start + (length or MINUTES_PER_DAY)
+
+
+def from_week_minute(minute):
+    """
+    Convert a minute of the week back to (day, HH:MM).
+    """
+    minute %= MINUTES_PER_WEEK
+    day, minute = divmod(minute, MINUTES_PER_DAY)
+    return REVERSE_WEEKDAY_MAP[day], f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def _split(start, end):
+    """
+    Split an interval that runs past the end of the week into pieces within [0, MINUTES_PER_WEEK).
+    """
+    if end <= MINUTES_PER_WEEK:
+        return [(start, end)]
+    return [(start, MINUTES_PER_WEEK), (0, end - MINUTES_PER_WEEK)]
+
+
+def _merge(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _intersect(a, b):
+    """
+    Intersection of two sorted, merged interval lists (linear merge).
+    """
+    result = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start, end = max(a[i][0], b[j][0]), min(a[i][1], b[j][1])
+        if start < end:
+            result.append((start, end))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def _subtract(intervals, busy):
+    """
+    Remove sorted, merged `busy` intervals from sorted, merged `intervals`.
+    """
+    result = []
+    j = 0
+    for start, end in intervals:
+        while j < len(busy) and busy[j][1] <= start:
+            j += 1
+        k = j
+        while k < len(busy) and busy[k][0] < end:
+            if busy[k][0] > start:
+                result.append((start, busy[k][0]))
+            start = max(start, busy[k][1])
+            k += 1
+        if start < end:
+            result.append((start, end))
+    return result
+
+
+def find_conflicts(cursor, student_ids, start_minute, end_minute):
+    """
+    IDs of active sessions that any of `student_ids` (as host or guest) has overlapping the interval.
+
+    Each lookup is a range scan of idx_sessions_host / idx_sessions_guest limited to sessions
+    starting within MAX_SESSION_MINUTES before the interval, so its cost depends on the number
+    of nearby sessions, not on the student's whole schedule.
+    """
+    placeholders = ", ".join("?" for _ in student_ids)
+    conflicts = set()
+    # The week wraps around, so also compare against the interval shifted one week either way
+    for shift in (0, MINUTES_PER_WEEK, -MINUTES_PER_WEEK):
+        start, end = start_minute + shift, end_minute + shift
+        for column in ("host_student_id", "guest_student_id"):
+            cursor.execute(f"""
+                SELECT session_id FROM scheduled_sessions
+                WHERE {column} IN ({placeholders})
+                  AND start_minute > ? AND start_minute < ?
+                  AND end_minute > ?
+                  AND status != 'cancelled'
+            """, (*student_ids, start - MAX_SESSION_MINUTES, end, start))
+            conflicts.update(row[0] for row in cursor.fetchall())
+    return sorted(conflicts)
+
+
+def create_session(host_id, guest_id, day, start_time, end_time, db_path=DB_PATH):
+    """
+    Schedule a weekly recurring session after checking neither student is already booked.
+
+    The check and the insert run in one BEGIN IMMEDIATE transaction, so two overlapping
+    sessions can never both be created. An invite notification for the guest is queued in
+    the same transaction.
+
+    Args:
+        host_id (str): Student creating the session.
+        guest_id (str): Invited student.
+        day (str): UTC weekday ('Mon' ... 'Sun').
+        start_time (str): UTC start time (HH:MM).
+        end_time (str): UTC end time (HH:MM).
+        db_path (str): Path to the SQLite database.
+
+    Returns:
+        int: The new session_id.
+
+    Raises:
+        SessionConflict: If the host or guest already has a session at that time.
+    """
+    start_minute, end_minute = to_week_interval(day, start_time, end_time)
+    if end_minute - start_minute > MAX_SESSION_MINUTES:
+        raise ValueError(f"Sessions can be at most {MAX_SESSION_MINUTES} minutes long")
+
+    conn = get_connection(db_path)
+    try:
+        conn.isolation_level = None
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            conflicts = find_conflicts(cursor, [host_id, guest_id], start_minute, end_minute)
+            if conflicts:
+                raise SessionConflict(conflicts)
+            cursor.execute("""
+                INSERT INTO scheduled_sessions (
+                    host_student_id, guest_student_id, day, start_time, end_time,
+                    start_minute, end_minute, status
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
+            """, (host_id, guest_id, day, start_time, end_time, start_minute, end_minute))
+            session_id = cursor.lastrowid
+            queue_notifications(cursor, [
+                (guest_id, "invite", f"{host_id} invited you to a study session on {day} at {start_time} UTC")
+            ])
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        return session_id
+    finally:
+        conn.close()
+
+
+def _load_availability(cursor, student_ids):
+    """
+    Weekly UTC availability of each student as merged minute-of-week intervals.
+    """
+    placeholders = ", ".join("?" for _ in student_ids)
+    cursor.execute(f"""
+        SELECT s.student_id, s.utc_start_time, s.utc_end_time, d.utc_day
+        FROM students s
+        JOIN utc_study_days d ON d.student_id = s.student_id
+        WHERE s.student_id IN ({placeholders})
+    """, list(student_ids))
+    availability = defaultdict(list)
+    for student_id, start_time, end_time, day in cursor.fetchall():
+        availability[student_id].extend(_split(*to_week_interval(day, start_time, end_time)))
+    return {student_id: _merge(intervals) for student_id, intervals in availability.items()}
+
+
+def _load_booked(cursor, student_ids):
+    """
+    Active sessions of each student (as host or guest) as merged minute-of-week intervals.
+    """
+    placeholders = ", ".join("?" for _ in student_ids)
+    cursor.execute(f"""
+        SELECT host_student_id, guest_student_id, start_minute, end_minute
+        FROM scheduled_sessions
+        WHERE (host_student_id IN ({placeholders}) OR guest_student_id IN ({placeholders}))
+          AND status != 'cancelled'
+    """, [*student_ids, *student_ids])
+    booked = defaultdict(list)
+    for host_id, guest_id, start_minute, end_minute in cursor.fetchall():
+        for student_id in (host_id, guest_id):
+            booked[student_id].extend(_split(start_minute, end_minute))
+    return {student_id: _merge(intervals) for student_id, intervals in booked.items()}
+
+
+def find_free_slots(host_id, guest_ids, min_minutes=60, conn=None):
+    """
+    Weekly slots when the host and each guest are all available and not already booked.
+
+    Availability and booked sessions for everyone are loaded with one query each, then
+    combined per guest with linear merges of sorted interval lists.
+
+    Args:
+        host_id (str): Student looking for a time.
+        guest_ids (list): Candidate guests (e.g. the host's matches).
+        min_minutes (int): Shortest slot worth returning.
+        conn: Optional open SQLite connection.
+
+    Returns:
+        Dict[str, List[dict]]: For each guest, slots with UTC day, start_time, end_time and minutes.
+    """
+    student_ids = [host_id, *guest_ids]
+    own_conn = conn is None
+    conn = conn or get_connection()
+    try:
+        cursor = conn.cursor()
+        availability = _load_availability(cursor, student_ids)
+        booked = _load_booked(cursor, student_ids)
+    finally:
+        if own_conn:
+            conn.close()
+
+    host_free = _subtract(availability.get(host_id, []), booked.get(host_id, []))
+    slots = {}
+    for guest_id in guest_ids:
+        guest_free = _subtract(availability.get(guest_id, []), booked.get(guest_id, []))
+        slots[guest_id] = []
+        for start, end in _intersect(host_free, guest_free):
+            if end - start < min_minutes:
+                continue
+            day, start_time = from_week_minute(start)
+            slots[guest_id].append({
+                "day": day,
+                "start_time": start_time,
+                "end_time": from_week_minute(end)[1],
+                "minutes": end - start,
+            })
+    return slots
+
+
+def create_smart_session(host_id, guest_id, minutes=60, db_path=DB_PATH):
+    """
+    Schedule a session in the first free slot the host and guest share.
+
+    Returns:
+        int or None: The new session_id, or None if they have no free slot that long.
+    """
+    conn = get_connection(db_path)
+    try:
+        slots = find_free_slots(host_id, [guest_id], minutes, conn=conn)[guest_id]
+    finally:
+        conn.close()
+    if not slots:
+        return None
+    slot = slots[0]
+    start_minute = WEEKDAY_MAP[slot["day"]] * MINUTES_PER_DAY + time_to_minutes(slot["start_time"])
+    return create_session(
+        host_id, guest_id, slot["day"], slot["start_time"], from_week_minute(start_minute + minutes)[1],
+        db_path=db_path
+    )
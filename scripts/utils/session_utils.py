@@ -0,0 +1,143 @@
+import hashlib
+import secrets
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from itsdangerous import BadSignature, URLSafeSerializer
+from werkzeug.security import check_password_hash
+
+from config import (
+    SECRET_KEY,
+    SESSION_LIFETIME_SECONDS,
+    SESSION_CACHE_SECONDS,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_QUEUE_LIMIT,
+    LOGIN_ATTEMPTS_PER_MINUTE,
+)
+from utils.db_utils import get_connection
+
+SESSION_COOKIE = "session_token"
+
+_serializer = URLSafeSerializer(SECRET_KEY, salt="study-buddy-session")
+_sessions = {}          # token_hash -> (session dict, monotonic time it was read from user_sessions)
+_sessions_lock = threading.Lock()
+
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_QUEUE_LIMIT)
+
+_attempts = defaultdict(deque)
+_attempts_lock = threading.Lock()
+
+
+class LoginThrottled(Exception):
+    """
+    Raised when a login cannot be checked right now (rate limit or hashing queue full).
+    """
+
+
+def _hash_token(session_id):
+    return hashlib.sha256(session_id.encode()).hexdigest()
+
+
+def create_session(user_id, student_id):
+    """
+    Start a server-side session and return the signed token to hand to the client.
+    """
+    session_id = secrets.token_urlsafe(32)
+    token_hash = _hash_token(session_id)
+    expires_at = time.time() + SESSION_LIFETIME_SECONDS
+    with get_connection() as conn:
+        conn.execute(
+            "INSERT INTO user_sessions (token_hash, user_id, student_id, expires_at) VALUES (?, ?, ?, ?)",
+            (token_hash, user_id, student_id, expires_at)
+        )
+    with _sessions_lock:
+        _sessions[token_hash] = (
+            {"user_id": user_id, "student_id": student_id, "expires_at": expires_at}, time.monotonic()
+        )
+    return _serializer.dumps(session_id)
+
+
+def get_session(token):
+    """
+    Return the session for a signed token, or None if it is forged, unknown or expired.
+
+    The signature is checked first, so forged tokens never reach the database; valid sessions
+    are cached in memory for SESSION_CACHE_SECONDS, after which the row is read again so a
+    logout handled by another worker takes effect here too.
+    """
+    if not token:
+        return None
+    try:
+        session_id = _serializer.loads(token)
+    except BadSignature:
+        return None
+    token_hash = _hash_token(session_id)
+
+    with _sessions_lock:
+        session, cached_at = _sessions.get(token_hash, (None, 0))
+    if session is None or time.monotonic() - cached_at > SESSION_CACHE_SECONDS:
+        with get_connection() as conn:
+            row = conn.execute(
+                "SELECT user_id, student_id, expires_at FROM user_sessions WHERE token_hash = ?",
+                (token_hash,)
+            ).fetchone()
+        if row is None:
+            with _sessions_lock:
+                _sessions.pop(token_hash, None)
+            return None
+        session = {"user_id": row[0], "student_id": row[1], "expires_at": row[2]}
+        with _sessions_lock:
+            _sessions[token_hash] = (session, time.monotonic())
+
+    if session["expires_at"] < time.time():
+        delete_session(token)
+        return None
+    return session
+
+
+def delete_session(token):
+    """
+    End a session (logout or expiry).
+    """
+    try:
+        token_hash = _hash_token(_serializer.loads(token))
+    except BadSignature:
+        return
+    with _sessions_lock:
+        _sessions.pop(token_hash, None)
+    with get_connection() as conn:
+        conn.execute("DELETE FROM user_sessions WHERE token_hash = ?", (token_hash,))
+
+
+def _check_rate_limit(email):
+    now = time.monotonic()
+    with _attempts_lock:
+        attempts = _attempts[email.lower()]
+        while attempts and now - attempts[0] > 60:
+            attempts.popleft()
+        if len(attempts) >= LOGIN_ATTEMPTS_PER_MINUTE:
+            raise LoginThrottled("Too many login attempts, please wait a minute")
+        attempts.append(now)
+
+
+def verify_password(email, password_hash, password):
+    """
+    Check a password on the bounded hashing pool.
+
+    At most PASSWORD_HASH_WORKERS hashes run at once and at most PASSWORD_HASH_QUEUE_LIMIT
+    logins may be waiting, so a login flood is turned away quickly instead of tying up every
+    request worker on CPU-bound hashing.
+
+    Raises:
+        LoginThrottled: If this email is over LOGIN_ATTEMPTS_PER_MINUTE or the queue is full.
+    """
+    _check_rate_limit(email or "")
+    if not _hash_slots.acquire(blocking=False):
+        raise LoginThrottled("Login service is busy, please try again")
+    try:
+        return _hash_pool.submit(check_password_hash, password_hash, password).result()
+    finally:
+        _hash_slots.release()
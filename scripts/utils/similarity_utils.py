@@ -0,0 +1,275 @@
+import numpy as np
+import pandas as pd
+
+from utils.match_utils import DAY_MASK_POPCOUNT, encode_day_mask, get_time_overlap_minutes
+from utils.time_utils import WEEKDAY_MAP, time_to_minutes
+
+STUDY_STYLES = ["Pair", "Group", "Flexible"]
+
+# MBTI letter pairs; the first letter of each pair maps to +1, the second to -1
+PERSONALITY_AXES = [("E", "I"), ("S", "N"), ("T", "F"), ("J", "P")]
+
+DEFAULT_WEIGHTS = {
+    "subjects": 3.0,
+    "days": 1.0,
+    "time": 1.0,
+    "style": 0.5,
+    "personality": 0.5,
+    "GPA": 0.25,
+}
+
+
+def _availability_histogram(start_time, end_time):
+    """
+    Minutes of availability in each of the 24 UTC hours (windows past midnight wrap around).
+    """
+    histogram = np.zeros(24, dtype=np.float32)
+    start = time_to_minutes(start_time)
+    end = time_to_minutes(end_time)
+    if end <= start:
+        end += 24 * 60
+    for minute in range(start, end, 60):
+        histogram[(minute // 60) % 24] += min(60, end - minute)
+    return histogram / 60
+
+
+def subject_vocabulary(student_profiles):
+    """
+    Sorted list of every subject in student_profiles (the subject columns of the feature matrix).
+    """
+    return sorted({s for profile in student_profiles.values() for s in profile["subjects"]})
+
+
+def build_feature_matrix(student_profiles, student_ids, weights=None, subjects=None):
+    """
+    Encode student profiles as weighted, L2-normalised feature vectors.
+
+    Each row is made of the following blocks. Every block is normalised on its own and
+    scaled by the square root of its weight, so a dot product between two rows is the
+    weighted average of the per-block cosine similarities:
+    - subjects: one-hot over all subjects
+    - days: the 7 bits of the UTC day mask
+    - time: availability minutes per UTC hour
+    - style: one-hot over Pair / Group / Flexible
+    - personality: +1/-1 per MBTI dimension (0 if unknown)
+    - GPA: a point on a half circle (GPAs 2 points apart are orthogonal)
+
+    Args:
+        student_profiles (dict): Profiles keyed by student_id.
+        student_ids (list): Students to encode, in row order.
+        weights (dict): Optional weight per block (defaults to DEFAULT_WEIGHTS).
+        subjects (list): Optional subject vocabulary in column order (defaults to every subject in
+            student_profiles). Matrices that are multiplied together must share it.
+
+    Returns:
+        np.ndarray: float32 matrix of shape (len(student_ids), n_features).
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    if subjects is None:
+        subjects = subject_vocabulary(student_profiles)
+    subject_pos = {subject: i for i, subject in enumerate(subjects)}
+
+    n_subjects = len(subjects)
+    day_offset = n_subjects
+    time_offset = day_offset + 7
+    style_offset = time_offset + 24
+    personality_offset = style_offset + len(STUDY_STYLES)
+    gpa_offset = personality_offset + len(PERSONALITY_AXES)
+
+    matrix = np.zeros((len(student_ids), gpa_offset + 2), dtype=np.float32)
+    for row, sid in enumerate(student_ids):
+        profile = student_profiles[sid]
+        for subject in profile["subjects"]:
+            if subject in subject_pos:
+                matrix[row, subject_pos[subject]] = 1
+        for day in profile["days"]:
+            matrix[row, day_offset + WEEKDAY_MAP[day]] = 1
+        matrix[row, time_offset:style_offset] = _availability_histogram(profile["start_time"], profile["end_time"])
+        if profile["style"] in STUDY_STYLES:
+            matrix[row, style_offset + STUDY_STYLES.index(profile["style"])] = 1
+        personality = (profile["personality"] or "").upper()
+        if len(personality) == 4:
+            for axis, (first, second) in enumerate(PERSONALITY_AXES):
+                if personality[axis] == first:
+                    matrix[row, personality_offset + axis] = 1
+                elif personality[axis] == second:
+                    matrix[row, personality_offset + axis] = -1
+        if profile["GPA"] is not None:
+            angle = profile["GPA"] / 4 * np.pi
+            matrix[row, gpa_offset:gpa_offset + 2] = (np.cos(angle), np.sin(angle))
+
+    blocks = [
+        ("subjects", 0, day_offset),
+        ("days", day_offset, time_offset),
+        ("time", time_offset, style_offset),
+        ("style", style_offset, personality_offset),
+        ("personality", personality_offset, gpa_offset),
+        ("GPA", gpa_offset, gpa_offset + 2),
+    ]
+    for name, start, end in blocks:
+        block_norms = np.linalg.norm(matrix[:, start:end], axis=1, keepdims=True)
+        block_norms[block_norms == 0] = 1
+        matrix[:, start:end] *= np.sqrt(weights[name]) / block_norms
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def build_tutor_vectors(student_profiles, weights=None):
+    """
+    Encode every tutor once so learner blocks can be scored against them repeatedly.
+
+    Args:
+        student_profiles (dict): Profiles keyed by student_id.
+        weights (dict): Optional weight per feature block (see build_feature_matrix).
+
+    Returns:
+        dict: 'tutor_ids' (row order), 'matrix' (their feature vectors), 'subjects' (the
+        vocabulary learner vectors must be built with) and 'weights'.
+    """
+    subjects = subject_vocabulary(student_profiles)
+    tutor_ids = [sid for sid, p in student_profiles.items() if p["role"] == "tutor"]
+    return {
+        "tutor_ids": tutor_ids,
+        "matrix": build_feature_matrix(student_profiles, tutor_ids, weights, subjects),
+        "subjects": subjects,
+        "weights": weights,
+    }
+
+
+def _match_row(user_id, partner_id, student_profiles, score):
+    """
+    Describe a similarity match with the same columns as custom_match.
+    """
+    user = student_profiles[user_id]
+    partner = student_profiles[partner_id]
+    day_overlap = DAY_MASK_POPCOUNT[encode_day_mask(user["days"]) & encode_day_mask(partner["days"])]
+    overlap = get_time_overlap_minutes(
+        user["start_time"], user["end_time"], partner["start_time"], partner["end_time"]
+    )
+    return {
+        'student_id': user_id,
+        'match_id': partner_id,
+        'subject_overlap': len(user["subjects"] & partner["subjects"]),
+        'day_overlap': day_overlap,
+        'time_overlap_minutes': overlap,
+        'style_match': user["style"] == partner["style"],
+        'goal_match': user["GPA"] == partner["GPA"],
+        'personality_match': user["personality"] == partner["personality"],
+        'total_score': round(float(score), 4)
+    }
+
+
+def iter_similarity_matches(student_profiles, k=3, weights=None, block_size=1024, learner_ids=None,
+                            tutor_vectors=None):
+    """
+    Yield the top k tutors for every learner by weighted cosine similarity of their profile vectors.
+
+    Learners are encoded one block at a time, and similarities are computed as (learner
+    block x tutor block) matrix products. Each product keeps only its top k per learner
+    before the next tutor block is processed, and a learner block's rows are yielded
+    before the next one is encoded. Apart from the tutor vectors (one row per tutor),
+    working memory is bounded by block_size * block_size scores.
+
+    Args:
+        student_profiles (dict): Profiles keyed by student_id.
+        k (int): Number of tutor matches per learner.
+        weights (dict): Optional weight per feature block (see build_feature_matrix).
+        block_size (int): Number of learners and tutors per block.
+        learner_ids (iterable): Optional subset of learners to match (defaults to every learner).
+        tutor_vectors (dict): Optional prebuilt tutor vectors (see build_tutor_vectors), reused
+            across calls; their weights are used instead of `weights`.
+
+    Yields:
+        dict: One match row with the same keys as custom_match. 'total_score' holds the
+        similarity (0-1).
+    """
+    if learner_ids is None:
+        learner_ids = [sid for sid, p in student_profiles.items() if p["role"] == "learner"]
+    learner_ids = list(learner_ids)
+    if tutor_vectors is None:
+        tutor_vectors = build_tutor_vectors(student_profiles, weights)
+    tutor_ids = tutor_vectors["tutor_ids"]
+    tutor_matrix = tutor_vectors["matrix"]
+    if not learner_ids or not tutor_ids:
+        return
+    k = min(k, len(tutor_ids))
+
+    for l_start in range(0, len(learner_ids), block_size):
+        block_ids = learner_ids[l_start:l_start + block_size]
+        learners = build_feature_matrix(
+            student_profiles, block_ids, tutor_vectors["weights"], tutor_vectors["subjects"]
+        )
+        best_scores = np.full((len(learners), k), -np.inf, dtype=np.float32)
+        best_idx = np.zeros((len(learners), k), dtype=np.int64)
+
+        for t_start in range(0, len(tutor_ids), block_size):
+            scores = learners @ tutor_matrix[t_start:t_start + block_size].T
+            block_k = min(k, scores.shape[1])
+            top = np.argpartition(-scores, block_k - 1, axis=1)[:, :block_k]
+
+            # Merge this block's top k into the running top k
+            merged_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            merged_idx = np.concatenate([best_idx, top + t_start], axis=1)
+            keep = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+            best_idx = np.take_along_axis(merged_idx, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_idx = np.take_along_axis(best_idx, order, axis=1)
+
+        for row, user_id in enumerate(block_ids):
+            for score, idx in zip(best_scores[row], best_idx[row]):
+                yield _match_row(user_id, tutor_ids[idx], student_profiles, score)
+
+
+def generate_all_similarity_matches(student_profiles, k=3, weights=None, block_size=1024, learner_ids=None,
+                                    tutor_vectors=None):
+    """
+    Rank tutors for every learner by profile similarity and collect the matches in a DataFrame.
+
+    The whole result is held in memory; use iter_similarity_matches to stream rows instead.
+
+    Args:
+        student_profiles (dict): Profiles keyed by student_id.
+        k (int): Number of tutor matches per learner.
+        weights (dict): Optional weight per feature block (see build_feature_matrix).
+        block_size (int): Number of learners and tutors per block.
+        learner_ids (list): Optional subset of learners to match (defaults to every learner).
+        tutor_vectors (dict): Optional prebuilt tutor vectors (see build_tutor_vectors).
+
+    Returns:
+        DataFrame of the top k matches per learner, with the same columns as custom_match.
+        'total_score' holds the similarity (0-1).
+    """
+    return pd.DataFrame(list(iter_similarity_matches(
+        student_profiles, k=k, weights=weights, block_size=block_size, learner_ids=learner_ids,
+        tutor_vectors=tutor_vectors
+    )))
+
+
+def similarity_match(user_id, student_profiles, k=3, weights=None, tutor_vectors=None):
+    """
+    Returns the top k tutor matches for a single learner ranked by profile similarity.
+
+    Alternative ranking engine to custom_match: instead of summing integer points, every
+    criterion contributes to a weighted cosine similarity, so tutors rarely tie.
+
+    Args:
+        user_id (str): Learner to match.
+        student_profiles (dict): Profiles keyed by student_id.
+        k (int): Number of matches.
+        weights (dict): Optional weight per feature block (see build_feature_matrix).
+        tutor_vectors (dict): Optional prebuilt tutor vectors (see build_tutor_vectors), reused
+            across calls so tutors are not re-encoded for every learner.
+
+    Returns:
+        List[dict]: Up to k matches with the same keys as custom_match.
+    """
+    if user_id not in student_profiles or student_profiles[user_id]["role"] != "learner":
+        return []
+    return list(iter_similarity_matches(
+        student_profiles, k=k, weights=weights, learner_ids=[user_id], tutor_vectors=tutor_vectors
+    ))
@@ -0,0 +1,221 @@
+import bisect
+import re
+import threading
+from collections import defaultdict
+
+from utils.change_feed import add_listener
+from utils.db_utils import get_connection
+
+# Free-text subjects within this many character edits of a known subject reuse it (one edit
+# for keys shorter than LONG_KEY_LENGTH); anything further away is only offered by search_subjects
+MAX_NORMALIZE_EDITS = 2
+LONG_KEY_LENGTH = 12
+MIN_SEARCH_SIMILARITY = 0.3
+
+# Trailing course numbers ("2", "II", "iv") that tell otherwise identical subjects apart
+_NUMERAL = re.compile(r"^(\d+|x{0,3}(ix|iv|v?i{0,3}))$")
+
+_lock = threading.Lock()
+_catalog = None
+
+
+def _key(name):
+    """
+    Comparison key for a subject name: lowercase letters and digits only.
+    """
+    return re.sub(r"[^a-z0-9]+", " ", name.lower()).strip()
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _trailing_numeral(key):
+    """
+    The last word of a key if it is an arabic or roman numeral, else None.
+    """
+    words = key.split()
+    if len(words) > 1 and words[-1] and _NUMERAL.match(words[-1]):
+        return words[-1]
+    return None
+
+
+def _edit_distance(a, b, max_edits):
+    """
+    Levenshtein distance between a and b, or max_edits + 1 once it is known to be larger.
+    """
+    if abs(len(a) - len(b)) > max_edits:
+        return max_edits + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > max_edits:
+            return max_edits + 1
+        previous = current
+    return previous[-1]
+
+
+def _build_catalog():
+    with get_connection() as conn:
+        names = [row[0] for row in conn.execute("SELECT subject_name FROM subjects ORDER BY subject_name")]
+
+    # (key, name) pairs for every word start, so "data" finds "Python for Data Analysis"
+    word_prefixes = []
+    trigram_index = defaultdict(set)
+    by_key = {}
+    for i, name in enumerate(names):
+        key = _key(name)
+        by_key.setdefault(key, name)
+        words = key.split()
+        for w in range(len(words)):
+            word_prefixes.append((" ".join(words[w:]), i))
+        for trigram in _trigrams(key):
+            trigram_index[trigram].add(i)
+    word_prefixes.sort()
+
+    return {
+        "names": names,
+        "by_key": by_key,
+        "word_prefixes": word_prefixes,
+        "prefix_keys": [key for key, _ in word_prefixes],
+        "trigram_index": trigram_index,
+        "trigram_counts": [len(_trigrams(_key(name))) for name in names],
+    }
+
+
+def _get_catalog():
+    global _catalog
+    with _lock:
+        if _catalog is None:
+            _catalog = _build_catalog()
+        return _catalog
+
+
+def invalidate_subject_catalog():
+    """
+    Drop the cached catalog; it is rebuilt from the database on next use.
+    """
+    global _catalog
+    with _lock:
+        _catalog = None
+
+
+def _apply_changes(changes):
+    if "subject" in changes:
+        invalidate_subject_catalog()
+
+
+add_listener(_apply_changes)
+
+
+def get_subject_names():
+    """
+    All subject names, sorted (replaces SELECT DISTINCT subject_name ... on every /form load).
+    """
+    return _get_catalog()["names"]
+
+
+def is_known_subject(name):
+    return _key(name) in _get_catalog()["by_key"]
+
+
+def _similar(catalog, key, min_similarity):
+    """
+    Score catalog subjects by trigram Jaccard similarity to `key`.
+    """
+    query = _trigrams(key)
+    overlap = defaultdict(int)
+    for trigram in query:
+        for i in catalog["trigram_index"].get(trigram, ()):
+            overlap[i] += 1
+    scored = []
+    for i, shared in overlap.items():
+        similarity = shared / (len(query) + catalog["trigram_counts"][i] - shared)
+        if similarity >= min_similarity:
+            scored.append((similarity, i))
+    scored.sort(key=lambda x: (-x[0], catalog["names"][x[1]]))
+    return scored
+
+
+def search_subjects(query, limit=10):
+    """
+    Suggest subjects for an autocomplete box.
+
+    Subjects whose name (or any word in it) starts with the query come first, followed by
+    fuzzy matches ranked by trigram similarity to catch typos.
+
+    Args:
+        query (str): Text typed so far.
+        limit (int): Maximum number of suggestions.
+
+    Returns:
+        List[str]: Subject names.
+    """
+    key = _key(query)
+    if not key:
+        return []
+    catalog = _get_catalog()
+
+    results = []
+    seen = set()
+    start = bisect.bisect_left(catalog["prefix_keys"], key)
+    for prefix_key, i in catalog["word_prefixes"][start:]:
+        if not prefix_key.startswith(key):
+            break
+        if i not in seen:
+            seen.add(i)
+            results.append(i)
+    # Whole-name prefix matches rank above matches on a later word, so rank every hit before truncating
+    results.sort(key=lambda i: (not _key(catalog["names"][i]).startswith(key), catalog["names"][i]))
+    del results[limit:]
+
+    if len(results) < limit:
+        for _, i in _similar(catalog, key, MIN_SEARCH_SIMILARITY):
+            if i not in seen:
+                seen.add(i)
+                results.append(i)
+                if len(results) >= limit:
+                    break
+
+    return [catalog["names"][i] for i in results]
+
+
+def resolve_subject_name(raw_name):
+    """
+    Map a free-text subject onto an existing subject when it is the same or a typo of it.
+
+    "python for data analysis" or "Pyton for Data Analysis" resolve to "Python for Data Analysis",
+    so typing a subject does not create a second subject_id for it. Only case/punctuation
+    differences and a few character edits are merged, and never when a trailing course number
+    differs ("Statistics II" stays apart from "Statistics"); looser matches are left to
+    search_subjects to offer as suggestions.
+
+    Returns:
+        str: The existing subject name, or the cleaned-up input if nothing is close enough.
+    """
+    words = raw_name.split()
+    cleaned = " ".join(words).title()
+    key = _key(cleaned)
+    catalog = _get_catalog()
+    if key in catalog["by_key"]:
+        return catalog["by_key"][key]
+    if _trailing_numeral(key) and not key.split()[-1].isdigit():
+        # Keep roman numerals upper case ("Statistics Ii" -> "Statistics II")
+        cleaned = " ".join(cleaned.split()[:-1] + [words[-1].upper()])
+
+    max_edits = MAX_NORMALIZE_EDITS if len(key) >= LONG_KEY_LENGTH else 1
+    numeral = _trailing_numeral(key)
+    best = None
+    for _, i in _similar(catalog, key, MIN_SEARCH_SIMILARITY):
+        candidate = _key(catalog["names"][i])
+        if _trailing_numeral(candidate) != numeral:
+            continue
+        edits = _edit_distance(key, candidate, max_edits)
+        if edits <= max_edits and (best is None or edits < best[0]):
+            best = (edits, i)
+    if best is not None:
+        return catalog["names"][best[1]]
+    return cleaned
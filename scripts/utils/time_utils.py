@@ -40,4 +40,47 @@ def get_utc_day(local_day_str, local_time_str, utc_offset):
     ref_date = datetime(2024, 1, 1 + weekday_index)
     local_dt = datetime.combine(ref_date.date(), datetime.strptime(local_time_str, "%H:%M").time())
     utc_dt = local_dt - timedelta(hours=utc_offset)
-    return REVERSE_WEEKDAY_MAP[utc_dt.weekday()]
\ No newline at end of file
+    return REVERSE_WEEKDAY_MAP[utc_dt.weekday()]
+
+def time_to_minutes(time_str):
+    """
+    Convert a time string (HH:MM) to minutes since midnight.
+    """
+    hours, minutes = time_str.split(":")
+    return int(hours) * 60 + int(minutes)
+
+def normalize_window(start_minute, end_minute):
+    """
+    Make a daily window given in minutes end after it starts (windows past midnight wrap around).
+
+    For example 23:00-03:00 (1380, 180) becomes (1380, 1620).
+    """
+    if end_minute <= start_minute:
+        end_minute += 24 * 60
+    return start_minute, end_minute
+
+def intersect_windows(window1, window2):
+    """
+    Largest common part of two normalized daily windows, comparing them modulo 24 hours.
+
+    Returns:
+        tuple: (start, end) within window1's range; end <= start if they do not overlap.
+    """
+    best = None
+    for shift in (0, 24 * 60, -24 * 60):
+        start = max(window1[0], window2[0] + shift)
+        end = min(window1[1], window2[1] + shift)
+        if best is None or end - start > best[1] - best[0]:
+            best = (start, end)
+    return best
+
+def window_overlap_minutes(start1, end1, start2, end2):
+    """
+    Minutes two daily windows (minutes since midnight) overlap, handling windows past midnight.
+    """
+    window1 = normalize_window(start1, end1)
+    window2 = normalize_window(start2, end2)
+    total = 0
+    for shift in (0, 24 * 60, -24 * 60):
+        total += max(0, min(window1[1], window2[1] + shift) - max(window1[0], window2[0] + shift))
+    return total
@@ -0,0 +1,200 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from config import DB_PATH
+from utils.change_feed import poll_changes, record_changes
+from utils.db_utils import get_connection, get_or_create_subject
+from utils.time_utils import get_utc_day
+
+logger = logging.getLogger(__name__)
+
+# How long the writer waits for more registrations before committing a batch
+BATCH_WINDOW_SECONDS = 0.005
+MAX_BATCH_SIZE = 100
+
+# How long a request waits for its registration to be committed
+SUBMIT_TIMEOUT_SECONDS = 30
+
+_queue = queue.Queue()
+_writer_lock = threading.Lock()
+_writer_thread = None
+_next_student_number = None
+
+
+def insert_registration(cursor, student_id, registration):
+    """
+    Insert one student profile from the registration form.
+
+    Args:
+        cursor: SQLite cursor object (inside the caller's transaction).
+        student_id (str): ID assigned to the new student.
+        registration (dict): Validated form values with keys user_id, student_name, personality_type,
+            study_style, utc_offset, experience_level, GPA, utc_start_time, utc_end_time,
+            local_start, days and subjects.
+
+    Raises:
+        LookupError: If the user account does not exist.
+    """
+    cursor.execute("SELECT 1 FROM users WHERE user_id = ?", (registration["user_id"],))
+    if not cursor.fetchone():
+        raise LookupError("User not found")
+
+    cursor.execute("""
+        INSERT INTO students (
+            student_id, student_name, personality_type, study_style, utc_offset,
+            experience_level, GPA, utc_start_time, utc_end_time
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        student_id,
+        registration["student_name"],
+        registration["personality_type"],
+        registration["study_style"],
+        registration["utc_offset"],
+        registration["experience_level"],
+        registration["GPA"],
+        registration["utc_start_time"],
+        registration["utc_end_time"]
+    ))
+
+    for day in registration["days"]:
+        cursor.execute(
+            'INSERT OR IGNORE INTO study_days (student_id, day) VALUES (?, ?)',
+            (student_id, day)
+        )
+        utc_day = get_utc_day(day, registration["local_start"], registration["utc_offset"])
+        cursor.execute(
+            'INSERT OR IGNORE INTO utc_study_days (student_id, utc_day) VALUES (?, ?)',
+            (student_id, utc_day)
+        )
+
+    for subject_name in registration["subjects"]:
+        subject_id = get_or_create_subject(cursor, subject_name)
+        cursor.execute(
+            "INSERT OR IGNORE INTO student_subjects (student_id, subject_id) VALUES (?, ?)",
+            (student_id, subject_id)
+        )
+
+    cursor.execute(
+        "UPDATE users SET student_id = ? WHERE user_id = ?",
+        (student_id, registration["user_id"])
+    )
+    record_changes(cursor, "student", [student_id])
+
+
+def _read_max_student_number(cursor):
+    cursor.execute("SELECT MAX(CAST(SUBSTR(student_id, 4) AS INTEGER)) FROM students")
+    return cursor.fetchone()[0] or 999
+
+
+def _write_one(cursor, registration):
+    """
+    Insert a registration inside a savepoint so a failure only rolls back this student.
+    """
+    global _next_student_number
+    cursor.execute("SAVEPOINT registration")
+    try:
+        for attempt in range(2):
+            student_id = f"stu{_next_student_number}"
+            try:
+                insert_registration(cursor, student_id, registration)
+                break
+            except sqlite3.IntegrityError:
+                # Another process (e.g. insert_data.py) took this ID; resync and retry once
+                cursor.execute("ROLLBACK TO registration")
+                _next_student_number = _read_max_student_number(cursor) + 1
+                if attempt:
+                    raise
+        _next_student_number += 1
+        cursor.execute("RELEASE registration")
+        return student_id
+    except Exception:
+        cursor.execute("ROLLBACK TO registration")
+        cursor.execute("RELEASE registration")
+        raise
+
+
+def _writer_loop():
+    global _next_student_number
+    conn = get_connection(DB_PATH)
+    conn.isolation_level = None
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA busy_timeout = 30000")
+    while True:
+        batch = [_queue.get()]
+        deadline = time.perf_counter() + BATCH_WINDOW_SECONDS
+        while len(batch) < MAX_BATCH_SIZE:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        results = []
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            if _next_student_number is None:
+                _next_student_number = _read_max_student_number(cursor) + 1
+            for registration, future in batch:
+                try:
+                    results.append((future, _write_one(cursor, registration), None))
+                except Exception as e:
+                    results.append((future, None, e))
+            cursor.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                cursor.execute("ROLLBACK")
+            _next_student_number = None
+            for registration, future in batch:
+                future.set_exception(e)
+            continue
+
+        # Update this process's caches before answering, so the new student is visible at once
+        try:
+            poll_changes()
+        except Exception:
+            logger.exception("Applying changes after commit failed")
+
+        for future, student_id, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(student_id)
+
+
+def _ensure_writer():
+    global _writer_thread
+    with _writer_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(target=_writer_loop, name="registration-writer", daemon=True)
+            _writer_thread.start()
+
+
+def submit_registration(registration, timeout=SUBMIT_TIMEOUT_SECONDS):
+    """
+    Queue a registration for the single writer thread and wait until it is committed.
+
+    The writer groups registrations arriving within BATCH_WINDOW_SECONDS into one transaction,
+    so a burst of sign-ups costs one commit per batch instead of one per student, and only one
+    connection ever competes for the SQLite write lock. Student IDs are assigned by the writer,
+    so concurrent submissions can never be given the same ID.
+
+    Args:
+        registration (dict): Validated form values (see insert_registration).
+        timeout (float): Seconds to wait for the commit.
+
+    Returns:
+        str: The new student's ID.
+
+    Raises:
+        LookupError: If the user account does not exist.
+    """
+    _ensure_writer()
+    future = Future()
+    _queue.put((registration, future))
+    return future.result(timeout=timeout)
@@ -0,0 +1,39 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'scripts')]
+
+# config reads these when it is first imported, so they are set before any app module is loaded.
+# Tests run against a copy of the shipped database, with background threads switched off.
+_tmp_dir = tempfile.mkdtemp(prefix="study_buddy_tests_")
+os.environ["STUDY_BUDDY_DB"] = os.path.join(_tmp_dir, "study_buddy.db")
+os.environ["MATCH_JOB_WORKERS"] = "0"
+os.environ["NOTIFICATION_SINK"] = ""
+os.environ["USE_READ_REPLICA"] = "0"
+os.environ["ENABLE_REQUEST_PROFILING"] = "0"
+
+shutil.copy(os.path.join(ROOT, "data", "processed", "study_buddy.db"), os.environ["STUDY_BUDDY_DB"])
+
+from setup_db import initialize_database  # noqa: E402
+
+initialize_database(os.environ["STUDY_BUDDY_DB"])
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_tmp_dir, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import create_app
+    return create_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
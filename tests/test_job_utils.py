@@ -0,0 +1,97 @@
+import gzip
+import json
+import sqlite3
+
+import pytest
+
+import utils.job_utils as job_utils
+from config import DB_PATH
+from utils.job_utils import (
+    JobLost, _update_owned, claim_next_job, enqueue_match_job, get_match_job, run_match_job
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_utils, "MATCH_JOB_RESULTS_DIR", str(tmp_path))
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute("DELETE FROM match_jobs")
+        conn.execute("DELETE FROM notifications")
+    conn.close()
+
+
+def make_stale(job_id):
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute(
+            "UPDATE match_jobs SET heartbeat_at = datetime('now', '-1 hour') WHERE job_id = ?", (job_id,)
+        )
+    conn.close()
+
+
+def count_notifications():
+    with sqlite3.connect(DB_PATH) as conn:
+        count = conn.execute("SELECT COUNT(*) FROM notifications WHERE type = 'new_match'").fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_duplicate_requests_share_one_job():
+    job_id, created = enqueue_match_job("custom", {"subjects": True, "days": True}, 3)
+    assert created
+    assert enqueue_match_job("custom", {"days": True, "subjects": True, "time": False}, 3) == (job_id, False)
+    assert enqueue_match_job("custom", {"subjects": True}, 3)[1]
+
+
+def test_job_is_claimed_by_one_worker():
+    job_id, _ = enqueue_match_job()
+    job = claim_next_job("worker-a")
+    assert job["job_id"] == job_id and job["worker_id"] == "worker-a"
+    assert claim_next_job("worker-b") is None
+    assert get_match_job(job_id)["attempts"] == 1
+
+
+def test_stale_job_is_reclaimed_and_old_owner_loses_it():
+    job_id, _ = enqueue_match_job()
+    old = claim_next_job("worker-a")
+    make_stale(job_id)
+    new = claim_next_job("worker-b")
+    assert new["job_id"] == job_id
+    assert get_match_job(job_id)["attempts"] == 2
+
+    with sqlite3.connect(DB_PATH) as conn:
+        with pytest.raises(JobLost):
+            _update_owned(conn, old, "UPDATE match_jobs SET progress = ? WHERE job_id = ?", (1,))
+    conn.close()
+
+    # The old owner's run stops without touching the row or publishing a result
+    run_match_job(old)
+    row = get_match_job(job_id)
+    assert row["status"] == "running" and row["worker_id"] == "worker-b" and row["result_path"] is None
+
+
+def test_job_abandoned_too_often_fails(monkeypatch):
+    monkeypatch.setattr(job_utils, "MAX_JOB_ATTEMPTS", 2)
+    job_id, _ = enqueue_match_job()
+    claim_next_job("worker-a")
+    make_stale(job_id)
+    claim_next_job("worker-b")
+    make_stale(job_id)
+
+    assert claim_next_job("worker-c") is None
+    row = get_match_job(job_id)
+    assert row["status"] == "failed" and "2 times" in row["error"]
+
+
+def test_finished_job_writes_results_and_notifies_only_new_matches():
+    job_id, _ = enqueue_match_job("default", None, 2)
+    run_match_job(claim_next_job("worker-a"))
+    row = get_match_job(job_id)
+    assert row["status"] == "done" and row["progress"] == row["total"]
+    with gzip.open(row["result_path"], "rt", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    assert rows and count_notifications() == len(rows)
+
+    # Same request again: nothing changed, so nobody is notified twice
+    enqueue_match_job("default", None, 2)
+    run_match_job(claim_next_job("worker-a"))
+    assert count_notifications() == len(rows)
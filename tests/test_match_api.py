@@ -0,0 +1,42 @@
+from utils.match_cache import get_cached_matches, get_cached_profiles, get_learner_ids
+from utils.match_utils import custom_match, default_match
+
+
+def test_matches_pages_cover_every_learner_once(client):
+    seen = []
+    cursor = None
+    while True:
+        query = {"limit": 7, "mode": "custom", "subjects": "1", "days": "1"}
+        if cursor:
+            query["cursor"] = cursor
+        body = client.get("/api/matches", query_string=query).get_json()
+        assert len(body["matches"]) <= 7
+        seen.extend(sorted(body["matches"]))
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+        assert cursor == seen[-1]
+    assert seen == get_learner_ids()
+
+
+def test_match_json_returns_cached_matches(client):
+    sid = get_learner_ids()[0]
+    body = client.get(f"/api/match/{sid}", query_string={"k": 5}).get_json()
+    expected = default_match(sid, get_cached_profiles(), k=5)
+    assert [m["match_id"] for m in body["matches"]] == [m["match_id"] for m in expected]
+    assert "student_id" not in body["matches"][0]
+
+
+def test_cached_matches_are_computed_once():
+    sid = get_learner_ids()[1]
+    preferences = {"subjects": True, "style": True}
+    first = get_cached_matches(sid, "custom", preferences, 3)
+    assert get_cached_matches(sid, "custom", {**preferences, "time": False}, 3) is first
+    assert first == custom_match(sid, preferences, get_cached_profiles(), k=3)
+
+
+def test_match_json_errors(client):
+    tutor = next(sid for sid, p in get_cached_profiles().items() if p["role"] == "tutor")
+    assert client.get("/api/match/stu0").status_code == 404
+    assert client.get(f"/api/match/{tutor}").status_code == 400
+    assert client.get("/api/matches", query_string={"mode": "similarity"}).status_code == 400
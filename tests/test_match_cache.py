@@ -0,0 +1,114 @@
+import sqlite3
+import uuid
+
+import pytest
+
+import utils.change_feed as change_feed
+import utils.replica as replica
+from config import DB_PATH
+from utils.change_feed import poll_changes, record_changes
+from utils.match_cache import get_cached_matches, get_cached_profiles, get_learner_ids, invalidate_match_cache
+from utils.write_queue import insert_registration
+
+
+@pytest.fixture(autouse=True)
+def feed(app):
+    # create_app starts the change feed; catch up on changes made by other tests
+    poll_changes()
+    invalidate_match_cache()
+
+
+def new_student_id():
+    return f"stu{900000 + uuid.uuid4().int % 99999}"
+
+
+def register(student_id, log=True):
+    """
+    Insert a learner straight into the database file, like another worker would.
+    """
+    with sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        user_id = cursor.execute(
+            "INSERT INTO users (email, password) VALUES (?, 'x')", (f"{uuid.uuid4().hex}@example.com",)
+        ).lastrowid
+        insert_registration(cursor, student_id, {
+            "user_id": user_id, "student_name": "New", "personality_type": "ENFP", "study_style": "Group",
+            "utc_offset": 0, "experience_level": "Beginner", "GPA": 2.0, "utc_start_time": "08:00",
+            "utc_end_time": "10:00", "local_start": "08:00", "days": ["Tue", "Thu"], "subjects": ["Machine Learning"],
+        })
+        if not log:
+            cursor.execute("DELETE FROM change_log WHERE student_id = ?", (student_id,))
+    conn.close()
+
+
+def test_new_student_is_loaded_incrementally():
+    profiles = get_cached_profiles()
+    sid = new_student_id()
+    register(sid)
+    poll_changes()
+
+    assert get_cached_profiles() is profiles
+    assert sid in profiles and sid in get_learner_ids()
+    assert get_cached_matches(sid)
+
+
+def test_bulk_change_reloads_every_profile():
+    get_cached_profiles()
+    sid = new_student_id()
+    register(sid, log=False)
+    with sqlite3.connect(DB_PATH) as conn:
+        record_changes(conn.cursor(), "student")
+    conn.close()
+    poll_changes()
+
+    assert sid in get_cached_profiles()
+
+
+def test_bulk_change_is_visible_with_the_replica_on(monkeypatch):
+    monkeypatch.setattr(replica, "USE_READ_REPLICA", True)
+    replica.load_replica()
+    replica.refresh_replica()
+    get_cached_profiles()
+
+    sid = new_student_id()
+    register(sid, log=False)
+    with sqlite3.connect(DB_PATH) as conn:
+        record_changes(conn.cursor(), "student")
+    conn.close()
+    poll_changes()
+
+    # The replica is re-copied in the background; the cache must not wait for it
+    assert sid in get_cached_profiles()
+
+
+def test_replica_follows_student_changes(monkeypatch):
+    monkeypatch.setattr(replica, "USE_READ_REPLICA", True)
+    replica.load_replica()
+    sid = new_student_id()
+    register(sid)
+    poll_changes()
+
+    conn = replica.get_read_connection()
+    try:
+        days = conn.execute("SELECT COUNT(*) FROM study_days WHERE student_id = ?", (sid,)).fetchone()[0]
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM students WHERE student_id = ?", (sid,))
+    finally:
+        conn.close()
+    assert days == 2
+
+
+def test_change_log_is_pruned_and_gaps_reload_everything(monkeypatch):
+    monkeypatch.setattr(change_feed, "CHANGE_LOG_MAX_ROWS", 5)
+    seen = []
+    monkeypatch.setattr(change_feed, "_listeners", [seen.append])
+
+    with sqlite3.connect(DB_PATH) as conn:
+        record_changes(conn.cursor(), "student", [f"stu{i}" for i in range(20)])
+    conn.close()
+    with sqlite3.connect(DB_PATH) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0] <= 5
+    conn.close()
+
+    poll_changes()
+    assert seen == [{"student": {None}, "subject": {None}}]
@@ -0,0 +1,73 @@
+import itertools
+
+import pytest
+
+from config import DB_PATH
+from utils.match_utils import (
+    DAY_MASK_POPCOUNT, _top_custom_matches, build_availability_index, custom_match, encode_day_mask,
+    get_candidate_ids, get_time_overlap_minutes, load_student_profiles
+)
+
+PREFERENCE_KEYS = ["subjects", "days", "time", "style", "GPA", "personality"]
+
+
+@pytest.fixture(scope="module")
+def profiles():
+    return load_student_profiles(DB_PATH)
+
+
+@pytest.fixture(scope="module")
+def tutor_index(profiles):
+    return build_availability_index(profiles, role="tutor")
+
+
+def learners(profiles):
+    return [sid for sid, p in profiles.items() if p["role"] == "learner"]
+
+
+@pytest.mark.parametrize("enabled", [
+    combo
+    for r in range(1, len(PREFERENCE_KEYS) + 1)
+    for combo in itertools.combinations(PREFERENCE_KEYS, r)
+    if "days" in combo
+])
+def test_indexed_custom_match_equals_full_scan(profiles, tutor_index, enabled):
+    preferences = {key: key in enabled for key in PREFERENCE_KEYS}
+    for sid in learners(profiles):
+        indexed = custom_match(sid, preferences, profiles, tutor_index, k=3)
+        full_scan = _top_custom_matches(sid, profiles[sid], preferences, profiles, profiles, k=3)
+        assert indexed == full_scan, sid
+
+
+def test_candidate_ids_are_tutors_sharing_enough_days(profiles, tutor_index):
+    for sid in learners(profiles)[:20]:
+        profile = profiles[sid]
+        expected = {
+            tid for tid, p in profiles.items()
+            if p["role"] == "tutor"
+            and DAY_MASK_POPCOUNT[encode_day_mask(p["days"]) & encode_day_mask(profile["days"])] >= 2
+        }
+        assert set(get_candidate_ids(tutor_index, profile, min_common_days=2)) == expected
+
+
+def test_candidate_ids_time_filter_matches_overlap(profiles, tutor_index):
+    for sid in learners(profiles)[:20]:
+        profile = profiles[sid]
+        candidates = set(get_candidate_ids(tutor_index, profile, min_common_days=0, min_overlap_minutes=60))
+        for tid, p in profiles.items():
+            if p["role"] != "tutor":
+                continue
+            overlap = get_time_overlap_minutes(profile["start_time"], profile["end_time"], p["start_time"], p["end_time"])
+            assert (tid in candidates) == (overlap >= 60)
+
+
+def test_time_overlap_wraps_past_midnight():
+    assert get_time_overlap_minutes("23:00", "03:00", "01:00", "05:00") == 120
+    assert get_time_overlap_minutes("22:00", "23:00", "23:00", "01:00") == 0
+    assert get_time_overlap_minutes("10:00", "12:00", "11:00", "14:00") == 60
+
+
+def test_custom_match_ignores_non_learners(profiles):
+    tutor = next(sid for sid, p in profiles.items() if p["role"] == "tutor")
+    assert custom_match(tutor, {"subjects": True}, profiles) == []
+    assert custom_match("stu0", {"subjects": True}, profiles) == []
@@ -0,0 +1,103 @@
+import sqlite3
+import time
+
+import pytest
+
+from config import DB_PATH
+from utils.notification_utils import (
+    CLAIM_LEASE_SECONDS, MAX_ATTEMPTS, MemorySink, _claim_due, dispatch_pending, load_sink,
+    queue_match_notifications, queue_notifications
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_outbox():
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute("DELETE FROM notifications")
+    conn.close()
+
+
+def queue(notifications):
+    with sqlite3.connect(DB_PATH) as conn:
+        queue_notifications(conn.cursor(), notifications)
+    conn.close()
+
+
+def statuses():
+    with sqlite3.connect(DB_PATH) as conn:
+        rows = conn.execute("SELECT status, attempts FROM notifications ORDER BY notification_id").fetchall()
+    conn.close()
+    return rows
+
+
+def test_match_notifications_are_sent_as_one_digest():
+    with sqlite3.connect(DB_PATH) as conn:
+        queue_match_notifications(conn.cursor(), [("stu1000", f"stu{2000 + i}") for i in range(7)])
+    conn.close()
+    queue([("stu1000", "message", "Hi")])
+
+    sink = MemorySink()
+    assert dispatch_pending(sink, DB_PATH) == {"sent": 8, "retried": 0, "failed": 0}
+    assert sorted(sink.delivered) == [
+        ("stu1000", "message", "Hi"),
+        ("stu1000", "new_match", "You have 7 new updates: " + "; ".join(
+            f"New study match: stu{2000 + i}" for i in range(5)
+        ) + "; and 2 more"),
+    ]
+    assert statuses() == [("sent", 0)] * 8
+
+
+def test_claimed_notifications_are_hidden_until_the_lease_expires():
+    queue([("stu1000", "message", "Hi"), ("stu1001", "message", "Hello")])
+
+    rows, lease = _claim_due(DB_PATH, 10)
+    assert len(rows) == 2 and lease >= time.time() + CLAIM_LEASE_SECONDS - 5
+    # A second dispatcher finds nothing while the lease holds
+    assert _claim_due(DB_PATH, 10)[0] == []
+    sink = MemorySink()
+    assert dispatch_pending(sink, DB_PATH)["sent"] == 0 and sink.delivered == []
+
+    # The first dispatcher died: once the lease expires the rows are due again
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute("UPDATE notifications SET next_attempt_at = ?", (time.time() - 1,))
+    conn.close()
+    assert dispatch_pending(sink, DB_PATH)["sent"] == 2
+    assert len(sink.delivered) == 2
+
+
+def test_results_from_an_expired_lease_are_ignored():
+    queue([("stu1000", "message", "Hi")])
+
+    class SlowSink(MemorySink):
+        def __call__(self, *notification):
+            # This delivery outlives its lease and another dispatcher claims the row meanwhile
+            with sqlite3.connect(DB_PATH) as conn:
+                conn.execute("UPDATE notifications SET next_attempt_at = 0")
+            conn.close()
+            self.reclaimed = _claim_due(DB_PATH, 10)[0]
+            super().__call__(*notification)
+
+    sink = SlowSink()
+    dispatch_pending(sink, DB_PATH)
+    assert len(sink.reclaimed) == 1
+    # The late 'sent' update did not match the new lease, so the new owner still holds the row
+    assert statuses() == [("pending", 0)]
+
+
+def test_failed_deliveries_back_off_then_fail():
+    queue([("stu1000", "message", "Hi")])
+    sink = MemorySink(fail_for={"stu1000"})
+    for attempt in range(1, MAX_ATTEMPTS):
+        assert dispatch_pending(sink, DB_PATH)["retried"] == 1
+        assert statuses() == [("pending", attempt)]
+        # Not due again until the backoff has passed
+        assert dispatch_pending(sink, DB_PATH)["retried"] == 0
+        with sqlite3.connect(DB_PATH) as conn:
+            conn.execute("UPDATE notifications SET next_attempt_at = 0")
+        conn.close()
+    assert dispatch_pending(sink, DB_PATH)["failed"] == 1
+    assert statuses() == [("failed", MAX_ATTEMPTS)]
+
+
+def test_load_sink_instantiates_classes():
+    assert isinstance(load_sink("utils.notification_utils:MemorySink"), MemorySink)
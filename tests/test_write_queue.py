@@ -0,0 +1,80 @@
+import sqlite3
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from config import DB_PATH
+from utils.write_queue import submit_registration
+
+
+def create_user():
+    with sqlite3.connect(DB_PATH) as conn:
+        user_id = conn.execute(
+            "INSERT INTO users (email, password) VALUES (?, 'x')", (f"{uuid.uuid4().hex}@example.com",)
+        ).lastrowid
+    conn.close()
+    return user_id
+
+
+def registration(user_id, **overrides):
+    return {
+        "user_id": user_id,
+        "student_name": "Test Student",
+        "personality_type": "INTJ",
+        "study_style": "Pair",
+        "utc_offset": 0,
+        "experience_level": "Beginner",
+        "GPA": 3.0,
+        "utc_start_time": "10:00",
+        "utc_end_time": "12:00",
+        "local_start": "10:00",
+        "days": ["Mon", "Wed"],
+        "subjects": ["Machine Learning"],
+        **overrides,
+    }
+
+
+def test_concurrent_registrations_get_unique_ids():
+    user_ids = [create_user() for _ in range(30)]
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        student_ids = list(pool.map(lambda uid: submit_registration(registration(uid)), user_ids))
+
+    assert len(set(student_ids)) == len(student_ids)
+    with sqlite3.connect(DB_PATH) as conn:
+        linked = dict(conn.execute(
+            f"SELECT user_id, student_id FROM users WHERE user_id IN ({', '.join('?' * len(user_ids))})", user_ids
+        ).fetchall())
+        days = conn.execute(
+            f"SELECT COUNT(*) FROM study_days WHERE student_id IN ({', '.join('?' * len(student_ids))})", student_ids
+        ).fetchone()[0]
+    conn.close()
+    assert linked == dict(zip(user_ids, student_ids))
+    assert days == 2 * len(student_ids)
+
+
+def test_failed_registration_does_not_affect_its_batch():
+    good_user = create_user()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        bad = pool.submit(submit_registration, registration(10 ** 9))
+        good = pool.submit(submit_registration, registration(good_user))
+        with pytest.raises(LookupError):
+            bad.result()
+        student_id = good.result()
+
+    with sqlite3.connect(DB_PATH) as conn:
+        row = conn.execute("SELECT student_id FROM users WHERE user_id = ?", (good_user,)).fetchone()
+    conn.close()
+    assert row[0] == student_id
+
+
+def test_new_subject_is_created_once():
+    name = f"Subject {uuid.uuid4().hex[:8]}"
+    user_ids = [create_user() for _ in range(5)]
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        list(pool.map(lambda uid: submit_registration(registration(uid, subjects=[name])), user_ids))
+
+    with sqlite3.connect(DB_PATH) as conn:
+        count = conn.execute("SELECT COUNT(*) FROM subjects WHERE subject_name = ?", (name,)).fetchone()[0]
+    conn.close()
+    assert count == 1